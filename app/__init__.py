@@ -7,12 +7,21 @@ from app.core.llm import clients
 from app.core.constants import DEFAULT_CRITERIA
 from app.routes import blueprints
 from app.core.tasks import celery as celery_app
+from app.core.score_aggregates import rebuild_score_aggregates, ensure_score_aggregates
+import click
 
 logger = logging.getLogger('main_app')
 
 def register_blueprints(app):
     for blueprint in blueprints:
         app.register_blueprint(blueprint)
+
+def register_commands(app):
+    @app.cli.command('rebuild-score-aggregates')
+    def rebuild_score_aggregates_command():
+        """Recompute the leaderboard score aggregates from all ratings."""
+        rows = rebuild_score_aggregates()
+        click.echo(f'Rebuilt {rows} score aggregate rows.')
         
 def initialize():
     
@@ -34,6 +43,7 @@ def initialize():
     
     logger.info("Registering blueprints.")
     register_blueprints(app)
+    register_commands(app)
     
     logger.info("Initializing Login Manager.")
     login_manager.init_app(app)
@@ -50,6 +60,7 @@ def create_app():
     with app.app_context():
         logger.info("Creating all database tables.")
         db.create_all()
+        ensure_score_aggregates()
         
         all_llms = LLM.query.all()
         logger.info(f"Creating LLM clients for {len(all_llms)} models.")
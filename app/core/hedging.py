@@ -0,0 +1,59 @@
+import threading
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from app.core.constants import HEDGE_POLICIES, HEDGE_MAX_WORKERS
+
+logger = logging.getLogger('hedging')
+
+hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_MAX_WORKERS, thread_name_prefix='hedge')
+
+
+class HedgePolicy:
+    """
+    Decides when a slow call gets a duplicate request on another API key.
+
+    The hedge delay is a percentile of this model's recent successful call
+    latencies, never below `min_delay`. At most `max_rate` of all calls may be
+    hedged, which bounds the extra cost to that share of requests.
+    """
+    def __init__(self, enabled: bool, percentile: float, min_samples: int, window: int, min_delay: float, max_rate: float):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.max_rate = max_rate
+        self.latencies = deque(maxlen=window)
+        self.calls = 0
+        self.hedges = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_model(cls, name: str) -> 'HedgePolicy':
+        options = {**HEDGE_POLICIES['default'], **HEDGE_POLICIES.get(name, {})}
+        return cls(**options)
+
+    def record(self, latency: float):
+        with self._lock:
+            self.latencies.append(latency)
+
+    def start_call(self) -> float | None:
+        """Counts a call and returns the seconds to wait before hedging it, or None when it must not be hedged."""
+        with self._lock:
+            self.calls += 1
+            if not self.enabled or len(self.latencies) < self.min_samples:
+                return None
+            ordered = sorted(self.latencies)
+            return max(self.min_delay, ordered[int(self.percentile * (len(ordered) - 1))])
+
+    def can_hedge(self) -> bool:
+        with self._lock:
+            return self.hedges < self.max_rate * self.calls
+
+    def record_hedge(self):
+        with self._lock:
+            self.hedges += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'calls': self.calls, 'hedges': self.hedges}
@@ -0,0 +1,80 @@
+import asyncio
+import threading
+import logging
+import httpx
+from app.core.constants import HTTP_POOL_LIMITS, HTTP_POOL_HTTP2, HTTP_POOL_PREWARM, MODEL_TIMEOUTS
+
+logger = logging.getLogger('http_pool')
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+def model_timeout(name: str) -> httpx.Timeout:
+    """Per-model connect/read timeouts; the pools are shared, so timeouts are applied per request."""
+    options = {**MODEL_TIMEOUTS['default'], **MODEL_TIMEOUTS.get(name, {})}
+    return httpx.Timeout(options['read'], connect=options['connect'])
+
+
+class HTTPPoolRegistry:
+    """
+    One keep-alive connection pool per (base_url, proxy), shared by every model and API key using it.
+
+    Async pools are bound to the event loop that created them and must be closed
+    with aclose_async() before that loop ends.
+    """
+    def __init__(self):
+        self._clients: dict[tuple, httpx.Client] = {}
+        self._async_clients: dict[asyncio.AbstractEventLoop, dict[tuple, httpx.AsyncClient]] = {}
+        self._lock = threading.Lock()
+        if HTTP_POOL_HTTP2 and not HTTP2_AVAILABLE:
+            logger.warning("HTTP/2 requested but the 'h2' package is not installed. Falling back to HTTP/1.1.")
+
+    def _options(self, proxy: str) -> dict:
+        return {
+            'proxy': proxy or None,
+            'limits': httpx.Limits(**HTTP_POOL_LIMITS),
+            'http2': HTTP_POOL_HTTP2 and HTTP2_AVAILABLE
+        }
+
+    def get(self, base_url: str, proxy: str) -> httpx.Client:
+        key = (base_url, proxy or None)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                logger.info(f"Creating shared HTTP pool for {base_url} (proxy: {proxy or 'none'}).")
+                client = self._clients[key] = httpx.Client(**self._options(proxy))
+            return client
+
+    def get_async(self, base_url: str, proxy: str) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        pools = self._async_clients.setdefault(loop, {})
+        key = (base_url, proxy or None)
+        if key not in pools:
+            pools[key] = httpx.AsyncClient(**self._options(proxy))
+        return pools[key]
+
+    async def aclose_async(self):
+        pools = self._async_clients.pop(asyncio.get_running_loop(), {})
+        for client in pools.values():
+            await client.aclose()
+
+    def _prewarm_one(self, base_url: str, proxy: str):
+        try:
+            self.get(base_url, proxy).head(base_url, timeout=model_timeout('default'))
+            logger.debug(f"Pre-warmed connection to {base_url}.")
+        except httpx.HTTPError as e:
+            logger.warning(f"Could not pre-warm connection to {base_url}: {e}")
+
+    def prewarm(self, targets: set[tuple[str, str]]):
+        """Opens one connection per pool in the background so the first real request skips the TCP/TLS handshake."""
+        if not HTTP_POOL_PREWARM:
+            return
+        for base_url, proxy in targets:
+            threading.Thread(target=self._prewarm_one, args=(base_url, proxy), daemon=True).start()
+
+
+http_pools = HTTPPoolRegistry()
@@ -0,0 +1,155 @@
+import threading
+import time
+import logging
+from app.core.constants import (
+    KEY_COOLDOWN_SECONDS,
+    KEY_MAX_COOLDOWN_SECONDS,
+    KEY_AUTH_COOLDOWN_SECONDS,
+    KEY_FAILURE_THRESHOLD,
+    KEY_LATENCY_EWMA_ALPHA
+)
+
+logger = logging.getLogger('key_pool')
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+SUCCESS = 'success'
+RATE_LIMITED = 'rate_limited'
+AUTH_ERROR = 'auth_error'
+FAILURE = 'failure'
+NEUTRAL = 'neutral'
+
+
+class KeyState:
+    """Health bookkeeping for a single API key."""
+    def __init__(self, index: int):
+        self.index = index
+        self.state = CLOSED
+        self.in_flight = 0
+        self.latency = None
+        self.requests = 0
+        self.successes = 0
+        self.rate_limited = 0
+        self.auth_errors = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.cooldown = KEY_COOLDOWN_SECONDS
+        self.cooldown_until = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            'index': self.index,
+            'state': self.state,
+            'in_flight': self.in_flight,
+            'latency': round(self.latency, 3) if self.latency is not None else None,
+            'requests': self.requests,
+            'successes': self.successes,
+            'rate_limited': self.rate_limited,
+            'auth_errors': self.auth_errors,
+            'failures': self.failures,
+            'cooldown_remaining': max(0.0, round(self.cooldown_until - time.time(), 1))
+        }
+
+
+class KeyPool:
+    """
+    Picks the least-loaded healthy API key for each request.
+
+    Every key has its own circuit breaker: rate limits, auth errors or repeated
+    failures open it for a cooldown, after which a single half-open probe decides
+    whether it closes again or stays open with a doubled cooldown.
+    """
+    def __init__(self, name: str, size: int):
+        self.name = name
+        self.keys = [KeyState(i) for i in range(size)]
+        self._lock = threading.Lock()
+
+    def _available(self, key: KeyState, now: float) -> bool:
+        if key.state == OPEN and now >= key.cooldown_until:
+            key.state = HALF_OPEN
+            logger.info(f"Key {key.index} of model {self.name} cooled down, allowing a half-open probe.")
+        if key.state == HALF_OPEN:
+            return key.in_flight == 0
+        return key.state == CLOSED
+
+    def _candidates(self, exclude: set[int], now: float) -> list[KeyState]:
+        return [k for k in self.keys if k.index not in exclude and self._available(k, now)]
+
+    def _reserve(self, key: KeyState) -> int:
+        key.in_flight += 1
+        key.requests += 1
+        return key.index
+
+    def acquire(self, exclude: set[int] = frozenset()) -> int:
+        """Reserves the best key and returns its index; release() must follow."""
+        with self._lock:
+            now = time.time()
+            candidates = self._candidates(exclude, now)
+            if candidates:
+                key = min(candidates, key=lambda k: (k.in_flight, k.latency or 0.0))
+            else:
+                fallback = [k for k in self.keys if k.index not in exclude] or self.keys
+                key = min(fallback, key=lambda k: k.cooldown_until)
+                logger.warning(f"No healthy API key for model {self.name}, falling back to key {key.index} (state {key.state}).")
+            return self._reserve(key)
+
+    def try_acquire(self, exclude: set[int] = frozenset()) -> int | None:
+        """Like acquire, but returns None instead of falling back when no other key is healthy."""
+        with self._lock:
+            candidates = self._candidates(exclude, time.time())
+            if not candidates:
+                return None
+            return self._reserve(min(candidates, key=lambda k: (k.in_flight, k.latency or 0.0)))
+
+    def has_healthy_key(self) -> bool:
+        with self._lock:
+            now = time.time()
+            return any(self._available(k, now) for k in self.keys)
+
+    def release(self, index: int, outcome: str, latency: float = None, retry_after: float = None):
+        with self._lock:
+            key = self.keys[index]
+            key.in_flight = max(0, key.in_flight - 1)
+
+            if outcome == SUCCESS:
+                key.successes += 1
+                key.consecutive_failures = 0
+                if latency is not None:
+                    key.latency = latency if key.latency is None else (
+                        KEY_LATENCY_EWMA_ALPHA * latency + (1 - KEY_LATENCY_EWMA_ALPHA) * key.latency
+                    )
+                if key.state != CLOSED:
+                    logger.info(f"Key {index} of model {self.name} recovered, closing circuit.")
+                key.state = CLOSED
+                key.cooldown = KEY_COOLDOWN_SECONDS
+            elif outcome == RATE_LIMITED:
+                key.rate_limited += 1
+                self._trip(key, retry_after)
+            elif outcome == AUTH_ERROR:
+                key.auth_errors += 1
+                self._trip(key, KEY_AUTH_COOLDOWN_SECONDS)
+            elif outcome == FAILURE:
+                key.failures += 1
+                key.consecutive_failures += 1
+                if key.state == HALF_OPEN or key.consecutive_failures >= KEY_FAILURE_THRESHOLD:
+                    self._trip(key)
+            elif key.state == HALF_OPEN:
+                key.state = CLOSED
+
+    def _trip(self, key: KeyState, cooldown: float = None):
+        if key.state == HALF_OPEN:
+            key.cooldown = min(key.cooldown * 2, KEY_MAX_COOLDOWN_SECONDS)
+        cooldown = cooldown or key.cooldown
+        key.state = OPEN
+        key.cooldown_until = time.time() + cooldown
+        logger.warning(f"Circuit opened for key {key.index} of model {self.name} for {cooldown:.1f}s.")
+
+    def stats(self) -> list[dict]:
+        with self._lock:
+            now = time.time()
+            for key in self.keys:
+                if key.state == OPEN and now >= key.cooldown_until:
+                    key.state = HALF_OPEN
+            return [key.as_dict() for key in self.keys]
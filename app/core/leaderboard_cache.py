@@ -0,0 +1,142 @@
+import pickle
+import threading
+import logging
+from collections import OrderedDict
+import redis
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from app.extensions import db
+from app.models import Rating, Question, Dimension, LLM, Setting, DataVersion
+from app.core.singleflight import SingleFlight
+from app.core.constants import (
+    LEADERBOARD_CACHE_BACKEND,
+    LEADERBOARD_CACHE_REDIS_URL,
+    LEADERBOARD_CACHE_TTL,
+    LEADERBOARD_CACHE_MAX_ENTRIES
+)
+
+logger = logging.getLogger('leaderboard_cache')
+
+VERSION_NAME = 'leaderboard'
+WATCHED_MODELS = (Rating, Question, Dimension, LLM, Setting)
+
+version_table = DataVersion.__table__
+
+
+def bump_data_version(connection):
+    """Increments the data version in the caller's transaction, so the bump commits or rolls back with the change."""
+    key = version_table.c.name == VERSION_NAME
+    updated = connection.execute(version_table.update().where(key).values(version=version_table.c.version + 1)).rowcount
+    if not updated:
+        connection.execute(version_table.insert().values(name=VERSION_NAME, version=1))
+
+
+def data_version() -> int:
+    return db.session.execute(select(DataVersion.version).where(DataVersion.name == VERSION_NAME)).scalar() or 0
+
+
+@event.listens_for(Session, 'after_flush')
+def _flushed(session, flush_context):
+    changed = any(isinstance(obj, WATCHED_MODELS) for obj in (*session.new, *session.deleted)) or any(
+        isinstance(obj, WATCHED_MODELS) and session.is_modified(obj) for obj in session.dirty
+    )
+    if changed:
+        bump_data_version(session.connection())
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _bulk_executed(orm_execute_state):
+    # 批量update/delete不经过flush
+    mapper = orm_execute_state.bind_mapper
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) and mapper is not None and issubclass(mapper.class_, WATCHED_MODELS):
+        bump_data_version(orm_execute_state.session.connection())
+
+
+class LeaderboardCache:
+    """
+    Computed leaderboard views keyed by (data version, view, sort_by, sort_order).
+
+    Every change to the data behind the leaderboard bumps the version in the
+    same transaction, so an entry is never served once its data has changed.
+    Concurrent misses for the same key in this process share one computation.
+    Cached values are shared between requests and must not be mutated.
+    """
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple, build):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+        value, _ = self._flight.do(repr(key), lambda: self._fetch(key, build))
+        return value
+
+    def _fetch(self, key: tuple, build):
+        value = self._load(key)
+        if value is None:
+            logger.info(f"Leaderboard cache miss for {key}, computing.")
+            value = build()
+            self._save(key, value)
+            with self._lock:
+                self.misses += 1
+        with self._lock:
+            for stale in [k for k in self._entries if k[0] < key[0]]:
+                del self._entries[stale]
+            self._entries[key] = value
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def _load(self, key: tuple):
+        return None
+
+    def _save(self, key: tuple, value):
+        pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
+
+
+class RedisLeaderboardCache(LeaderboardCache):
+    """Also stores computed views in Redis, so other processes at the same data version reuse them."""
+    def __init__(self, url: str, ttl: int, max_entries: int):
+        super().__init__(max_entries)
+        self.redis = redis.Redis.from_url(url, socket_timeout=2, socket_connect_timeout=2)
+        self.ttl = ttl
+
+    @staticmethod
+    def _redis_key(key: tuple) -> str:
+        return 'leaderboard:' + ':'.join(str(part) for part in key)
+
+    def _load(self, key: tuple):
+        try:
+            payload = self.redis.get(self._redis_key(key))
+        except redis.RedisError as e:
+            logger.warning(f"Redis leaderboard cache unavailable, computing locally. Error: {e}")
+            return None
+        return pickle.loads(payload) if payload is not None else None
+
+    def _save(self, key: tuple, value):
+        try:
+            self.redis.set(self._redis_key(key), pickle.dumps(value), ex=self.ttl)
+        except redis.RedisError as e:
+            logger.warning(f"Could not store leaderboard view {key} in Redis. Error: {e}")
+
+
+if LEADERBOARD_CACHE_BACKEND == 'redis':
+    leaderboard_cache = RedisLeaderboardCache(LEADERBOARD_CACHE_REDIS_URL, LEADERBOARD_CACHE_TTL, LEADERBOARD_CACHE_MAX_ENTRIES)
+else:
+    leaderboard_cache = LeaderboardCache(LEADERBOARD_CACHE_MAX_ENTRIES)
+
+
+def cached_view(view: str, sort_by: str, sort_order: str, build):
+    """build() for the current data version, computed at most once per version in this process."""
+    return leaderboard_cache.get((data_version(), view, sort_by, sort_order), build)
@@ -1,35 +1,295 @@
 import openai
 import httpx
 import ast
-from app.core.constants import CONNECTION_ERROR_RETRIES
+import asyncio
+import re
+import time
+import threading
+from concurrent.futures import wait, FIRST_COMPLETED, TimeoutError as FuturesTimeoutError
+from app.core.constants import (
+    ASYNC_MAX_CONCURRENCY,
+    RESPONSE_CACHE_ENABLED,
+    GENERATION_PROFILES,
+    GENERATION_PROFILE_OVERRIDES,
+    STREAMING_CUTOFF_ENABLED,
+    STREAM_INCLUDE_USAGE,
+    CHARS_PER_TOKEN_ESTIMATE,
+    SINGLEFLIGHT_ENABLED,
+    SINGLEFLIGHT_BACKEND,
+    SINGLEFLIGHT_REDIS_URL
+)
+from app.core.key_pool import KeyPool, SUCCESS, RATE_LIMITED, AUTH_ERROR, FAILURE, NEUTRAL
+from app.core.retry import RetryPolicy, parse_retry_after
+from app.core.response_cache import response_cache
+from app.core.http_pool import http_pools, model_timeout
+from app.core.singleflight import SingleFlight, RedisSingleFlight, make_key
+from app.core.hedging import HedgePolicy, hedge_executor
 import logging
 
 logger = logging.getLogger('llm_clients')
 
+# 流式截断：一旦已收到的内容满足模式即关闭流（要求其后已出现一个分隔字符，避免把"As"或"10"截成"A"或"1"）
+# 字母后须为括号或标点，空格不算分隔，以免把以冠词"A "开头的英文回复截成"A"；没有标点的回复读完整个流
+STREAM_CUTOFF_PATTERNS = {
+    'letter': re.compile(r'^\s*[（(【\[]?([A-D])(?=[)）\]】.。、:：,，;；!！])'),
+    'score': re.compile(r'^\s*(\d+(?:\.\d+)?)(?=[^\d.])'),
+}
+
+class LLMResult:
+    """Outcome of one logical LLM call, after retries. `content` keeps the legacy error strings on failure."""
+    def __init__(self, content: str, error: str = None, retries: int = 0, cached: bool = False,
+                 prompt_tokens: int = 0, completion_tokens: int = 0, latency: float = 0.0, key_index: int = None,
+                 top_logprobs: list[tuple[str, float]] = None):
+        self.content = content
+        self.error = error
+        self.retries = retries
+        self.cached = cached
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.latency = latency
+        self.key_index = key_index
+        self.top_logprobs = top_logprobs
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def outcome(self) -> str:
+        if self.cached:
+            return 'cached'
+        return 'ok' if self.ok else self.error
+
+    def shared_copy(self) -> 'LLMResult':
+        """The result as handed to a coalesced caller: no request was sent for it, so it carries no usage."""
+        return LLMResult(self.content, self.error, self.retries, cached=self.ok)
+
+    def __repr__(self):
+        return f'<LLMResult {"ok" if self.ok else self.error} after {self.retries} retries>'
+
+class StreamedCompletion:
+    """Content collected from a streamed completion, possibly cut off once it became valid."""
+    def __init__(self):
+        self.content = ''
+        self.finish_reason = None
+        self.usage = None
+        self.cut_off = False
+
+    def feed(self, chunk, pattern: re.Pattern) -> bool:
+        """Adds one chunk and returns True once the collected content matches the cutoff pattern."""
+        if getattr(chunk, 'usage', None):
+            self.usage = chunk.usage
+        if chunk.choices:
+            choice = chunk.choices[0]
+            if choice.delta and choice.delta.content:
+                self.content += choice.delta.content
+            if choice.finish_reason:
+                self.finish_reason = choice.finish_reason
+        self.cut_off = bool(pattern.search(self.content))
+        return self.cut_off
+
 class LLMClient:
     clients: list[openai.OpenAI] = []
     
     def __init__(self, name: str, model: str, base_url: str, api_keys: list[str], proxy: str):
+        self.name = name
+        self.timeout = model_timeout(name)
         self.clients = [
             self.create_client(base_url, api_key, proxy)
             for api_key in api_keys
         ]
-        self.name = name
         self.model = model
-        self.index = -1
+        self.base_url = base_url
+        self.api_keys = api_keys
+        self.proxy = proxy
+        self.key_pool = KeyPool(name, len(api_keys))
+        self.retry_policy = RetryPolicy.for_model(name)
+        self.hedge_policy = HedgePolicy.for_model(name)
         
     def create_client(self, base_url: str, api_key: str, proxy: str) -> openai.OpenAI:
         return openai.OpenAI(
             api_key=api_key,
             base_url=base_url,
-            http_client=httpx.Client(proxy = proxy if proxy else None)
+            http_client=http_pools.get(base_url, proxy),
+            timeout=self.timeout,
+            max_retries=0
         )
     
-    @property
-    def client(self) -> openai.OpenAI:
-        self.index = (self.index + 1) % len(self.clients)
-        logger.debug(f"Using API key index {self.index} for model {self.name}.")
-        return self.clients[self.index]
+    def create_async_client(self, api_key: str, http_client: httpx.AsyncClient) -> openai.AsyncOpenAI:
+        return openai.AsyncOpenAI(
+            api_key=api_key,
+            base_url=self.base_url,
+            http_client=http_client,
+            timeout=self.timeout,
+            max_retries=0
+        )
+    
+    def _key_outcome(self, e: Exception) -> str:
+        if isinstance(e, openai.RateLimitError):
+            return RATE_LIMITED
+        if isinstance(e, (openai.AuthenticationError, openai.PermissionDeniedError)):
+            return AUTH_ERROR
+        if isinstance(e, (openai.APIConnectionError, openai.InternalServerError)):
+            return FAILURE
+        return NEUTRAL
+    
+    def generation_params(self, profile: str | None) -> dict:
+        """Request parameters of a generation profile, with this model's overrides applied."""
+        if profile is None:
+            return {}
+        params = {**GENERATION_PROFILES.get(profile, {}), **GENERATION_PROFILE_OVERRIDES.get(self.name, {}).get(profile, {})}
+        return {key: value for key, value in params.items() if value is not None}
+    
+    def _split_params(self, params: dict) -> tuple[dict, re.Pattern | None]:
+        request = {key: value for key, value in params.items() if key != 'stream_cutoff'}
+        cutoff = params.get('stream_cutoff') if STREAMING_CUTOFF_ENABLED else None
+        return request, STREAM_CUTOFF_PATTERNS[cutoff] if cutoff else None
+    
+    def _request(self, client: openai.OpenAI, prompt: str, params: dict, cancelled: threading.Event = None):
+        request, cutoff = self._split_params(params)
+        messages = [{'role': 'user', 'content': prompt}]
+        if cutoff is None:
+            return client.chat.completions.create(model=self.model, messages=messages, **request)
+
+        if STREAM_INCLUDE_USAGE:
+            request['stream_options'] = {'include_usage': True}
+        streamed = StreamedCompletion()
+        stream = client.chat.completions.create(model=self.model, messages=messages, stream=True, **request)
+        try:
+            for chunk in stream:
+                if cancelled is not None and cancelled.is_set():
+                    logger.debug(f"Closing stream for model {self.name}: the hedged request was answered first.")
+                    break
+                if streamed.feed(chunk, cutoff):
+                    logger.debug(f"Cutting off stream for model {self.name} after valid output: '{streamed.content}'.")
+                    break
+        finally:
+            stream.close()
+        return streamed
+    
+    async def _arequest(self, client: openai.AsyncOpenAI, prompt: str, params: dict):
+        request, cutoff = self._split_params(params)
+        messages = [{'role': 'user', 'content': prompt}]
+        if cutoff is None:
+            return await client.chat.completions.create(model=self.model, messages=messages, **request)
+
+        if STREAM_INCLUDE_USAGE:
+            request['stream_options'] = {'include_usage': True}
+        streamed = StreamedCompletion()
+        stream = await client.chat.completions.create(model=self.model, messages=messages, stream=True, **request)
+        try:
+            async for chunk in stream:
+                if streamed.feed(chunk, cutoff):
+                    logger.debug(f"Cutting off stream for model {self.name} after valid output: '{streamed.content}'.")
+                    break
+        finally:
+            await stream.close()
+        return streamed
+    
+    def _create_completion(self, index: int, prompt: str, params: dict, cancelled: threading.Event = None):
+        logger.debug(f"Using API key index {index} for model {self.name}.")
+        started = time.monotonic()
+        try:
+            response = self._request(self.clients[index], prompt, params, cancelled)
+        except Exception as e:
+            self.key_pool.release(index, self._key_outcome(e), retry_after=parse_retry_after(e))
+            raise
+        latency = time.monotonic() - started
+        self.key_pool.release(index, SUCCESS, latency)
+        if cancelled is None or not cancelled.is_set():
+            self.hedge_policy.record(latency)
+        return response
+    
+    async def _acreate_completion(self, index: int, prompt: str, params: dict, http_client: httpx.AsyncClient):
+        logger.debug(f"Using API key index {index} for model {self.name}.")
+        started = time.monotonic()
+        try:
+            client = self.create_async_client(self.api_keys[index], http_client)
+            response = await self._arequest(client, prompt, params)
+        except BaseException as e:
+            self.key_pool.release(index, self._key_outcome(e), retry_after=parse_retry_after(e))
+            raise
+        latency = time.monotonic() - started
+        self.key_pool.release(index, SUCCESS, latency)
+        self.hedge_policy.record(latency)
+        return response
+    
+    def _hedge_index(self, index: int, delay: float) -> int | None:
+        """Reserves another healthy key for a hedge, or returns None when the rate cap or the key pool rules it out."""
+        if not self.hedge_policy.can_hedge():
+            return None
+        hedge_index = self.key_pool.try_acquire(exclude={index})
+        if hedge_index is not None:
+            self.hedge_policy.record_hedge()
+            logger.info(f"Call to model {self.name} on key {index} exceeded {delay:.1f}s, hedging on key {hedge_index}.")
+        return hedge_index
+    
+    def _hedged_completion(self, index: int, prompt: str, params: dict) -> tuple[object, int]:
+        """
+        Runs one attempt and returns the response with the index of the key that answered.
+        A hedged loser that streams is closed; a non-streaming one finishes in the background and is ignored.
+        """
+        delay = self.hedge_policy.start_call()
+        if delay is None:
+            return self._create_completion(index, prompt, params), index
+
+        cancelled = {index: threading.Event()}
+        primary = hedge_executor.submit(self._create_completion, index, prompt, params, cancelled[index])
+        try:
+            return primary.result(timeout=delay), index
+        except FuturesTimeoutError:
+            pass
+        hedge_index = self._hedge_index(index, delay)
+        if hedge_index is None:
+            return primary.result(), index
+
+        cancelled[hedge_index] = threading.Event()
+        hedge = hedge_executor.submit(self._create_completion, hedge_index, prompt, params, cancelled[hedge_index])
+        attempts = {primary: index, hedge: hedge_index}
+        pending = set(attempts)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        cancelled[attempts[loser]].set()
+                    if future is hedge:
+                        logger.info(f"Hedged request for model {self.name} on key {hedge_index} answered first.")
+                    return future.result(), attempts[future]
+        return primary.result(), index
+
+    async def _ahedged_completion(self, index: int, prompt: str, params: dict, http_client: httpx.AsyncClient) -> tuple[object, int]:
+        """Async counterpart of _hedged_completion; the losing request is cancelled."""
+        delay = self.hedge_policy.start_call()
+        if delay is None:
+            return await self._acreate_completion(index, prompt, params, http_client), index
+
+        attempts = {asyncio.create_task(self._acreate_completion(index, prompt, params, http_client)): index}
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=delay)
+            hedge_index = None if done else self._hedge_index(index, delay)
+            if hedge_index is not None:
+                attempts[asyncio.create_task(self._acreate_completion(hedge_index, prompt, params, http_client))] = hedge_index
+            pending = set(attempts)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if attempts[task] != index:
+                            logger.info(f"Hedged request for model {self.name} on key {hedge_index} answered first.")
+                        return task.result(), attempts[task]
+            primary = next(iter(attempts))
+            return primary.result(), index
+        finally:
+            for task in attempts:
+                task.cancel()
+            await asyncio.gather(*attempts, return_exceptions=True)
+    
+    def key_stats(self) -> list[dict]:
+        stats = self.key_pool.stats()
+        for key_stats, api_key in zip(stats, self.api_keys):
+            key_stats['key'] = f"...{api_key[-4:]}"
+        return stats
 
     def _parse_detailed_error(self, e: openai.APIError) -> str:
         if e.body and isinstance(e.body, dict) and 'error' in e.body:
@@ -48,39 +308,13 @@ class LLMClient:
         
         return message_str
 
-    def generate_response(self, prompt: str) -> str:
-        response = None
-        for i in range(CONNECTION_ERROR_RETRIES):
-            try:
-                logger.debug(f"Attempting to generate response for model {self.name}. Try {i+1}/{CONNECTION_ERROR_RETRIES}.")
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[{'role': 'user', 'content': prompt}]
-                )
-                break
-
-            except openai.APIConnectionError as e:
-                logger.warning(f"APIConnectionError for model {self.name} on try {i+1}. Error: {e}")
-                if i == CONNECTION_ERROR_RETRIES - 1:
-                    logger.error(f"Connection finally failed for model {self.name} after {CONNECTION_ERROR_RETRIES} retries.")
-                    return "Connection error"
-            
-            except (openai.InternalServerError, openai.BadRequestError) as e:
-                detailed_message = self._parse_detailed_error(e)
-                logger.error(f"Fatal API Error for model {self.name} (BadRequest/InternalServer): {detailed_message}")
-                return f"API Error: {detailed_message}"
-            
-            except openai.APIError as e:
-                detailed_message = self._parse_detailed_error(e)
-                logger.error(f"Unhandled API Error for model {self.name}: {detailed_message}")
-                return f"API Error: {detailed_message}"
-
-            except Exception as e:
-                logger.critical(f"An unexpected non-API error occurred for model {self.name}: {e}", exc_info=True)
-                return "Unexpected client error"
-
-        if response is None:
-            return "Failed to get response"
+    def _extract_content(self, response) -> str:
+        if isinstance(response, StreamedCompletion):
+            if response.content:
+                logger.info(f"Successfully received streamed content from model {self.name}{' (cut off early)' if response.cut_off else ''}.")
+                return response.content
+            logger.warning(f"Streamed content was empty for model {self.name}. Fallback to finish_reason: '{response.finish_reason}'")
+            return response.finish_reason or "No choices in response"
 
         try:
             if response.choices:
@@ -104,8 +338,141 @@ class LLMClient:
                 content = "Response parsing failed completely"
             
         return content
+
+    def _usage(self, response, prompt: str, content: str) -> tuple[int, int]:
+        """Token usage reported by the provider, or a rough estimate from text length when it is missing."""
+        usage = getattr(response, 'usage', None)
+        if usage is not None and usage.prompt_tokens is not None:
+            return usage.prompt_tokens, usage.completion_tokens or 0
+        return len(prompt) // CHARS_PER_TOKEN_ESTIMATE + 1, len(content) // CHARS_PER_TOKEN_ESTIMATE + 1
+
+    def _top_logprobs(self, response) -> list[tuple[str, float]] | None:
+        """Alternatives for the first generated token, when logprobs were requested and returned."""
+        try:
+            return [(alt.token, alt.logprob) for alt in response.choices[0].logprobs.content[0].top_logprobs]
+        except (AttributeError, IndexError, TypeError):
+            return None
+
+    def _has_content(self, response) -> bool:
+        """Whether the model returned text, rather than content falling back to finish_reason or an error string."""
+        if isinstance(response, StreamedCompletion):
+            return bool(response.content)
+        try:
+            return bool(response.choices[0].message.content)
+        except (AttributeError, IndexError, TypeError, KeyError):
+            return False
+
+    def _success(self, response, prompt: str, attempt: int, started: float, index: int) -> 'LLMResult':
+        content = self._extract_content(response)
+        prompt_tokens, completion_tokens = self._usage(response, prompt, content)
+        return LLMResult(
+            content, error=None if self._has_content(response) else 'empty_response', retries=attempt,
+            prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+            latency=time.monotonic() - started, key_index=index,
+            top_logprobs=self._top_logprobs(response)
+        )
+
+    def _failure(self, e: Exception, attempt: int) -> 'LLMResult | None':
+        """Returns None when the attempt should be retried, otherwise the final failed result."""
+        if self.retry_policy.should_retry(e, attempt, self.key_pool.has_healthy_key()):
+            logger.warning(f"{type(e).__name__} for model {self.name} on try {attempt+1}, retrying. Error: {e}")
+            return None
+
+        if isinstance(e, openai.APIConnectionError):
+            logger.error(f"Connection finally failed for model {self.name} after {attempt+1} tries.")
+            return LLMResult("Connection error", error='connection_error', retries=attempt)
+        if isinstance(e, openai.APIError):
+            detailed_message = self._parse_detailed_error(e)
+            logger.error(f"API Error for model {self.name} after {attempt+1} tries ({type(e).__name__}): {detailed_message}")
+            return LLMResult(f"API Error: {detailed_message}", error='api_error', retries=attempt)
+        logger.critical(f"An unexpected non-API error occurred for model {self.name}: {e}", exc_info=True)
+        return LLMResult("Unexpected client error", error='client_error', retries=attempt)
+
+    def _cache_lookup(self, prompt: str, params: dict, use_cache: bool, refresh_cache: bool) -> tuple[str | None, 'LLMResult | None']:
+        """Returns the cache key (None when caching is off for this call) and a cached result, if any."""
+        if not (RESPONSE_CACHE_ENABLED and use_cache):
+            return None, None
+        key = response_cache.make_key(self.model, self.base_url, prompt, params)
+        if refresh_cache:
+            return key, None
+        content = response_cache.get(key)
+        if content is None:
+            return key, None
+        logger.info(f"Response cache hit for model {self.name}.")
+        return key, LLMResult(content, cached=True)
+
+    def _cache_store(self, key: str | None, result: 'LLMResult') -> 'LLMResult':
+        if key is not None and result.ok:
+            response_cache.set(key, result.content)
+        return result
+
+    def complete(self, prompt: str, use_cache: bool = True, refresh_cache: bool = False, profile: str = None) -> 'LLMResult':
+        """
+        Sends one prompt under this model's retry policy, using the named generation profile.
+        use_cache=False bypasses the response cache entirely; refresh_cache=True skips the read but stores the new response.
+        """
+        params = self.generation_params(profile)
+        cache_key, cached = self._cache_lookup(prompt, params, use_cache, refresh_cache)
+        if cached is not None:
+            return cached
+
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            index = self.key_pool.acquire()
+            try:
+                logger.debug(f"Attempting to generate response for model {self.name}. Try {attempt+1}/{self.retry_policy.max_attempts}.")
+                response, index = self._hedged_completion(index, prompt, params)
+                break
+            except Exception as e:
+                result = self._failure(e, attempt)
+                if result is not None:
+                    result.latency, result.key_index = time.monotonic() - started, index
+                    return result
+                time.sleep(self.retry_policy.delay(e, attempt, self.key_pool.has_healthy_key()))
+                attempt += 1
+
+        return self._cache_store(cache_key, self._success(response, prompt, attempt, started, index))
+
+    async def acomplete(self, prompt: str, http_client: httpx.AsyncClient, use_cache: bool = True, refresh_cache: bool = False, profile: str = None) -> 'LLMResult':
+        """Async counterpart of complete, sending over a shared httpx.AsyncClient."""
+        params = self.generation_params(profile)
+        cache_key, cached = self._cache_lookup(prompt, params, use_cache, refresh_cache)
+        if cached is not None:
+            return cached
+
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            index = self.key_pool.acquire()
+            try:
+                logger.debug(f"Attempting to generate async response for model {self.name}. Try {attempt+1}/{self.retry_policy.max_attempts}.")
+                response, index = await self._ahedged_completion(index, prompt, params, http_client)
+                break
+            except Exception as e:
+                result = self._failure(e, attempt)
+                if result is not None:
+                    result.latency, result.key_index = time.monotonic() - started, index
+                    return result
+                await asyncio.sleep(self.retry_policy.delay(e, attempt, self.key_pool.has_healthy_key()))
+                attempt += 1
+
+        return self._cache_store(cache_key, self._success(response, prompt, attempt, started, index))
+
+    def generate_response(self, prompt: str, use_cache: bool = True, refresh_cache: bool = False, profile: str = None) -> str:
+        return self.complete(prompt, use_cache, refresh_cache, profile).content
     
 
+singleflight = (
+    RedisSingleFlight(
+        SINGLEFLIGHT_REDIS_URL,
+        serialize=lambda result: result.content.encode('utf-8') if result.ok else None,
+        deserialize=lambda payload: LLMResult(payload.decode('utf-8'))
+    )
+    if SINGLEFLIGHT_BACKEND == 'redis' else SingleFlight()
+)
+
+
 class Clients:
     clients: dict[int: LLMClient] = {}
     _initialized = False
@@ -122,6 +489,7 @@ class Clients:
         logger.info(f"Creating/updating a total of {len(models)} LLM clients.")
         for model in models:
             self.create_client(**model)
+        http_pools.prewarm({(c.base_url, c.proxy) for c in self.clients.values()})
         
         if models:
             self._initialized = True
@@ -130,17 +498,94 @@ class Clients:
         logger.info(f"Initializing client for model '{name}' (ID: {id}) with {len(api_keys)} API key(s).")
         self.clients[id] = LLMClient(name, model, base_url, api_keys, proxy)
     
-    def generate_response(self, prompt: str, id: int) -> str:
-        return self.clients[id].generate_response(prompt)
+    def complete(self, prompt: str, id: int, use_cache: bool = True, refresh_cache: bool = False, profile: str = None) -> LLMResult:
+        """
+        Sends one prompt to one model. Identical concurrent calls (same model, prompt and
+        parameters) share a single upstream request, unless use_cache=False or refresh_cache=True
+        asks for a fresh one; a retry with refresh_cache must never get a shared earlier reply.
+        """
+        client = self.clients[id]
+        if not (SINGLEFLIGHT_ENABLED and use_cache) or refresh_cache:
+            return client.complete(prompt, use_cache, refresh_cache, profile)
+
+        key = make_key(id, prompt, client.generation_params(profile))
+        result, shared = singleflight.do(key, lambda: client.complete(prompt, use_cache, refresh_cache, profile))
+        if shared:
+            logger.info(f"Shared an in-flight response from model {client.name} instead of sending a duplicate request.")
+            return result.shared_copy()
+        return result
+    
+    def generate_response(self, prompt: str, id: int, use_cache: bool = True, refresh_cache: bool = False, profile: str = None) -> str:
+        return self.complete(prompt, id, use_cache, refresh_cache, profile).content
+    
+    def key_pool_stats(self) -> dict:
+        return {
+            id: {'name': client.name, 'keys': client.key_stats(), 'hedging': client.hedge_policy.stats()}
+            for id, client in self.clients.items()
+        }
     
-    def generate_responses(self, prompt: str, exclusions: list[int]) -> dict[int: str]:
-        responses = {}
-        target_clients = [c for i, c in self.clients.items() if i not in exclusions]
-        logger.info(f"Generating responses from {len(target_clients)} models, excluding IDs: {exclusions}.")
-        for i in self.clients:
-            if i not in exclusions:
-                responses[i] = self.generate_response(prompt, i)
+    async def acomplete_many(self, prompt: str, exclusions: list[int], max_concurrency: int = ASYNC_MAX_CONCURRENCY, use_cache: bool = True, profile: str = None):
+        """Sends the prompt to all non-excluded models at once, yielding (id, LLMResult) as each one finishes."""
+        target_clients = {i: c for i, c in self.clients.items() if i not in exclusions}
+        logger.info(f"Generating async responses from {len(target_clients)} models (concurrency {max_concurrency}), excluding IDs: {exclusions}.")
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def generate(i: int, client: LLMClient):
+            async with semaphore:
+                http_client = http_pools.get_async(client.base_url, client.proxy)
+                return i, await client.acomplete(prompt, http_client, use_cache, profile=profile)
+
+        tasks = [asyncio.create_task(generate(i, c)) for i, c in target_clients.items()]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await http_pools.aclose_async()
+    
+    def complete_many(self, prompt: str, exclusions: list[int], on_result=None, use_cache: bool = True, profile: str = None) -> dict[int: LLMResult]:
+        """Blocking wrapper around acomplete_many; on_result(id, result) is called as each model finishes."""
+        async def collect() -> dict[int: LLMResult]:
+            results = {}
+            async for i, result in self.acomplete_many(prompt, exclusions, use_cache=use_cache, profile=profile):
+                results[i] = result
+                if on_result is not None:
+                    on_result(i, result)
+            return results
         
-        return responses
+        return asyncio.run(collect())
+    
+    async def acomplete_prompts(self, id: int, prompts: dict, max_concurrency: int = ASYNC_MAX_CONCURRENCY, use_cache: bool = True):
+        """
+        Sends several prompts to one model at once, yielding (key, LLMResult) as each one finishes.
+        `prompts` maps a caller-chosen key to a (prompt, profile) pair.
+        """
+        client = self.clients[id]
+        logger.info(f"Generating {len(prompts)} async responses from model {client.name} (concurrency {max_concurrency}).")
+        semaphore = asyncio.Semaphore(max_concurrency)
+        http_client = http_pools.get_async(client.base_url, client.proxy)
+
+        async def generate(key, prompt: str, profile: str):
+            async with semaphore:
+                return key, await client.acomplete(prompt, http_client, use_cache, profile=profile)
+
+        tasks = [asyncio.create_task(generate(key, prompt, profile)) for key, (prompt, profile) in prompts.items()]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await http_pools.aclose_async()
+
+    def complete_prompts(self, id: int, prompts: dict, max_concurrency: int = ASYNC_MAX_CONCURRENCY, use_cache: bool = True) -> dict:
+        """Blocking wrapper around acomplete_prompts, returning the results by key."""
+        async def collect() -> dict:
+            return {key: result async for key, result in self.acomplete_prompts(id, prompts, max_concurrency, use_cache)}
+
+        return asyncio.run(collect())
         
 clients = Clients()
\ No newline at end of file
@@ -0,0 +1,145 @@
+import time
+import uuid
+import logging
+from urllib.parse import urlparse
+import redis
+from app.core.constants import (
+    CELERY_BROKER_URL,
+    GENERATION_QUEUE,
+    RATING_QUEUE,
+    QUEUE_THROUGHPUT_WINDOW,
+    PROVIDER_GROUPS,
+    PROVIDER_QUEUES,
+    PROVIDER_MAX_IN_FLIGHT,
+    PROVIDER_SLOT_LEASE
+)
+
+logger = logging.getLogger('queues')
+
+STAGE_QUEUES = [GENERATION_QUEUE, RATING_QUEUE, *sorted(set(PROVIDER_QUEUES.values()))]
+BUCKET_SECONDS = 60
+
+_redis = redis.Redis.from_url(CELERY_BROKER_URL, socket_timeout=2, socket_connect_timeout=2)
+
+
+# 清除过期名额后，未满上限时占用一个名额
+ACQUIRE_SCRIPT = '''
+local key, now, lease, cap, token = KEYS[1], tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), ARGV[4]
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now - lease)
+if redis.call('ZCARD', key) < cap then
+    redis.call('ZADD', key, now, token)
+    redis.call('EXPIRE', key, math.ceil(lease))
+    return 1
+end
+return 0
+'''
+
+
+def provider_group(name: str, base_url: str) -> str:
+    """The provider a model belongs to: its configured group, otherwise the host of its base URL."""
+    return PROVIDER_GROUPS.get(name) or urlparse(base_url or '').hostname or 'default'
+
+
+def provider_queue(group: str) -> str:
+    return PROVIDER_QUEUES.get(group, GENERATION_QUEUE)
+
+
+class ProviderSlots:
+    """
+    Caps the generation calls in flight per provider across all workers.
+
+    Each slot is a member of a Redis sorted set scored by its start time, so a
+    slot that was never released (a crashed worker) expires after the lease.
+    When Redis is unreachable the cap is not enforced.
+    """
+    def __init__(self, client: redis.Redis, lease: float):
+        self.redis = client
+        self.lease = lease
+        self._acquire = client.register_script(ACQUIRE_SCRIPT)
+
+    def limit(self, group: str) -> int | None:
+        return PROVIDER_MAX_IN_FLIGHT.get(group, PROVIDER_MAX_IN_FLIGHT['default'])
+
+    def acquire(self, group: str) -> str | None:
+        """Returns a slot token (empty when the provider is uncapped), or None when the provider is at its cap."""
+        cap = self.limit(group)
+        if cap is None:
+            return ''
+        token = uuid.uuid4().hex
+        try:
+            if self._acquire(keys=[f'provider_slots:{group}'], args=[time.time(), self.lease, cap, token]):
+                return token
+            return None
+        except redis.RedisError as e:
+            logger.warning(f"Could not acquire a slot for provider {group}, running without its in-flight cap. Error: {e}")
+            return ''
+
+    def acquire_up_to(self, group: str, count: int) -> list[str]:
+        """Acquires as many of `count` slots as the cap allows; an empty list means the provider is full."""
+        tokens = []
+        while len(tokens) < count:
+            token = self.acquire(group)
+            if token is None:
+                break
+            if token == '':
+                return tokens + [''] * (count - len(tokens))
+            tokens.append(token)
+        return tokens
+
+    def release(self, group: str, token: str):
+        if not token:
+            return
+        try:
+            self.redis.zrem(f'provider_slots:{group}', token)
+        except redis.RedisError as e:
+            logger.warning(f"Could not release slot of provider {group}; it expires after {self.lease}s. Error: {e}")
+
+    def in_flight(self, group: str) -> int | None:
+        try:
+            return self.redis.zcount(f'provider_slots:{group}', time.time() - self.lease, '+inf')
+        except redis.RedisError:
+            return None
+
+
+def _bucket_key(queue: str, bucket: int) -> str:
+    return f'queue_stats:{queue}:{bucket}'
+
+
+def record_completion(queue: str):
+    """Counts one finished task of the queue in the current one-minute bucket."""
+    key = _bucket_key(queue, int(time.time()) // BUCKET_SECONDS)
+    try:
+        pipe = _redis.pipeline()
+        pipe.incr(key)
+        pipe.expire(key, QUEUE_THROUGHPUT_WINDOW + BUCKET_SECONDS)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.debug(f"Could not record completion for queue {queue}. Error: {e}")
+
+
+def queue_stats(queues: list[str] = None) -> dict[str, dict]:
+    """
+    Depth (messages waiting in the Redis broker list) and throughput (tasks finished per minute
+    over the last QUEUE_THROUGHPUT_WINDOW seconds) of each queue. Values are None when Redis is unreachable.
+    """
+    queues = queues or STAGE_QUEUES
+    current = int(time.time()) // BUCKET_SECONDS
+    buckets = range(current - QUEUE_THROUGHPUT_WINDOW // BUCKET_SECONDS + 1, current + 1)
+    stats = {}
+    for queue in queues:
+        try:
+            depth = _redis.llen(queue)
+            completed = sum(int(count or 0) for count in _redis.mget([_bucket_key(queue, bucket) for bucket in buckets]))
+        except redis.RedisError as e:
+            logger.warning(f"Could not read stats of queue {queue}. Error: {e}")
+            stats[queue] = {'depth': None, 'completed': None, 'per_minute': None}
+            continue
+        stats[queue] = {
+            'depth': depth,
+            'completed': completed,
+            'per_minute': completed * BUCKET_SECONDS / QUEUE_THROUGHPUT_WINDOW
+        }
+    return stats
+
+
+provider_slots = ProviderSlots(_redis, PROVIDER_SLOT_LEASE)
@@ -0,0 +1,94 @@
+import hashlib
+import json
+import re
+import unicodedata
+import logging
+from sqlalchemy.exc import IntegrityError
+from app.extensions import db
+from app.models import Answer, Question, LLM, RatingCacheEntry
+from app.core.constants import RATING_CACHE_ENABLED, RATING_TEMPLATE, RATER_SCORING_MODES
+
+logger = logging.getLogger('rating_cache')
+
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_answer(text: str) -> str:
+    """Answers that differ only in width, case or whitespace are rated the same."""
+    return WHITESPACE.sub(' ', unicodedata.normalize('NFKC', text or '')).strip().lower()
+
+
+def answer_hash(text: str) -> str:
+    return hashlib.sha256(normalize_answer(text).encode('utf-8')).hexdigest()
+
+
+def criteria_hash(question: Question, criteria: str, total_score: float, rater: LLM) -> str:
+    """Everything besides the answer that the rater's score depends on."""
+    payload = json.dumps([
+        RATING_TEMPLATE.get(question.question_type),
+        question.content,
+        question.answer,
+        criteria,
+        total_score,
+        rater.model,
+        rater.base_url,
+        RATER_SCORING_MODES.get(rater.name, RATER_SCORING_MODES['default'])
+    ], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class RatingCache:
+    """
+    Per-rater scores of normalized answers to one question, stored in the database.
+
+    An entry only counts as a hit while its criteria hash matches the current
+    question, criteria, total score and rater configuration; storing a new score
+    replaces the stale entry in place.
+    """
+    def __init__(self, question: Question, criteria: str, total_score: float, raters: dict[int, LLM]):
+        self.question_id = question.id
+        self.criteria_hashes = {rater_id: criteria_hash(question, criteria, total_score, rater) for rater_id, rater in raters.items()}
+
+    def lookup(self, answers: list[Answer]) -> dict[tuple[int, int], float]:
+        """Cached scores by (answer id, rater id)."""
+        if not RATING_CACHE_ENABLED or not answers:
+            return {}
+        hashes = {answer.id: answer_hash(answer.content) for answer in answers}
+        entries = RatingCacheEntry.query.filter(
+            RatingCacheEntry.question_id == self.question_id,
+            RatingCacheEntry.answer_hash.in_(set(hashes.values())),
+            RatingCacheEntry.rater_id.in_(self.criteria_hashes)
+        ).all()
+        found = {
+            (entry.answer_hash, entry.rater_id): entry.score
+            for entry in entries if entry.criteria_hash == self.criteria_hashes[entry.rater_id]
+        }
+        hits = {
+            (answer_id, rater_id): found[(digest, rater_id)]
+            for answer_id, digest in hashes.items() for rater_id in self.criteria_hashes
+            if (digest, rater_id) in found
+        }
+        if hits:
+            logger.info(f"Rating cache hit for {len(hits)} answer/rater pairs of Question ID {self.question_id}.")
+        return hits
+
+    def store(self, answer: Answer, rater_id: int, score: float | None):
+        """Adds or refreshes a valid score in the session; the caller commits."""
+        if not RATING_CACHE_ENABLED or score is None or rater_id not in self.criteria_hashes:
+            return
+        digest = answer_hash(answer.content)
+        entry = RatingCacheEntry.query.filter_by(question_id=self.question_id, answer_hash=digest, rater_id=rater_id).first()
+        if entry is not None:
+            entry.criteria_hash, entry.score = self.criteria_hashes[rater_id], score
+            return
+        try:
+            with db.session.begin_nested():
+                db.session.add(RatingCacheEntry(
+                    question_id=self.question_id,
+                    answer_hash=digest,
+                    rater_id=rater_id,
+                    criteria_hash=self.criteria_hashes[rater_id],
+                    score=score
+                ))
+        except IntegrityError:
+            logger.debug(f"Rating cache entry for Question ID {self.question_id} was stored concurrently, keeping it.")
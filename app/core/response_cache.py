@@ -0,0 +1,95 @@
+import sqlite3
+import threading
+import hashlib
+import json
+import time
+import logging
+from pathlib import Path
+from app.core.constants import (
+    RESPONSE_CACHE_PATH,
+    RESPONSE_CACHE_TTL_SECONDS,
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_EVICT_INTERVAL
+)
+
+logger = logging.getLogger('response_cache')
+
+
+class ResponseCache:
+    """
+    Content-addressed cache of successful LLM responses in a local SQLite file.
+
+    Entries expire after `ttl` seconds, and once the table grows past
+    `max_entries` the least recently read entries are evicted. Each thread
+    opens its own connection, so Celery and web processes can share the file.
+    """
+    def __init__(self, path: str, ttl: float, max_entries: int):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+
+    @staticmethod
+    def make_key(model: str, base_url: str, prompt: str, params: dict = None) -> str:
+        payload = json.dumps([model, base_url, prompt, params or {}], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                'key TEXT PRIMARY KEY, content TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)'
+            )
+            connection.execute('CREATE INDEX IF NOT EXISTS ix_responses_accessed ON responses (accessed)')
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str) -> str | None:
+        try:
+            row = self.connection.execute('SELECT content, created FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if now - row[1] > self.ttl:
+                self.connection.execute('DELETE FROM responses WHERE key = ?', (key,))
+                return None
+            self.connection.execute('UPDATE responses SET accessed = ? WHERE key = ?', (now, key))
+            return row[0]
+        except sqlite3.Error as e:
+            logger.warning(f"Response cache read failed, treating as miss. Error: {e}")
+            return None
+
+    def set(self, key: str, content: str):
+        try:
+            now = time.time()
+            self.connection.execute(
+                'INSERT OR REPLACE INTO responses (key, content, created, accessed) VALUES (?, ?, ?, ?)',
+                (key, content, now, now)
+            )
+            self._writes += 1
+            if self._writes % RESPONSE_CACHE_EVICT_INTERVAL == 0:
+                self.evict()
+        except sqlite3.Error as e:
+            logger.warning(f"Response cache write failed. Error: {e}")
+
+    def evict(self):
+        expired = self.connection.execute('DELETE FROM responses WHERE created < ?', (time.time() - self.ttl,)).rowcount
+        overflow = self.connection.execute(
+            'DELETE FROM responses WHERE key IN ('
+            'SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,)
+        ).rowcount
+        if expired or overflow:
+            logger.info(f"Response cache evicted {expired} expired and {overflow} least recently used entries.")
+
+    def clear(self):
+        self.connection.execute('DELETE FROM responses')
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_PATH, RESPONSE_CACHE_TTL_SECONDS, RESPONSE_CACHE_MAX_ENTRIES)
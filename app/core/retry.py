@@ -0,0 +1,188 @@
+import threading
+import random
+import time
+import uuid
+import logging
+from email.utils import parsedate_to_datetime
+import openai
+import redis
+from app.core.constants import (
+    RETRY_POLICIES,
+    RETRY_AFTER_MAX_SECONDS,
+    RETRY_BUDGET_PER_RUN,
+    RETRY_BUDGET_WINDOW_SECONDS,
+    RETRY_BUDGET_BACKEND,
+    CELERY_BROKER_URL
+)
+
+logger = logging.getLogger('retry_policy')
+
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+KEY_ERRORS = (
+    openai.AuthenticationError,
+    openai.PermissionDeniedError,
+)
+
+RETRYABLE_STATUS_CODES = {408, 409}
+
+
+def parse_retry_after(e: Exception) -> float | None:
+    """Reads Retry-After (seconds or HTTP date) or retry-after-ms from an API error's response headers."""
+    response = getattr(e, 'response', None)
+    if response is None:
+        return None
+    headers = response.headers
+
+    retry_after_ms = headers.get('retry-after-ms')
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+
+    retry_after = headers.get('retry-after')
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        logger.warning(f"Could not parse Retry-After header: '{retry_after}'")
+        return None
+
+
+# 当前周期不存在（新运行开始或超过时间窗口）时开启新周期，再在该周期的计数上加一
+CONSUME_SCRIPT = '''
+local epoch = redis.call('GET', KEYS[1])
+if not epoch then
+    epoch = ARGV[3]
+    redis.call('SET', KEYS[1], epoch, 'EX', ARGV[2])
+end
+local used = redis.call('INCR', KEYS[1] .. ':' .. epoch)
+redis.call('EXPIRE', KEYS[1] .. ':' .. epoch, ARGV[2])
+if used > tonumber(ARGV[1]) then
+    return 0
+end
+return 1
+'''
+
+
+class RetryBudget:
+    """
+    Caps the number of retries a run may spend in this process.
+
+    The budget refills when a new run starts (reset) or once the window has
+    passed since the last refill, so a stuck provider cannot turn a weekly run
+    into an unbounded retry storm.
+    """
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+        self._lock = threading.Lock()
+        self.used = 0
+        self.started = time.time()
+
+    def reset(self, run_id: str = None):
+        with self._lock:
+            self.used = 0
+            self.started = time.time()
+
+    def consume(self) -> bool:
+        with self._lock:
+            if time.time() - self.started >= self.window:
+                self.used = 0
+                self.started = time.time()
+            if self.used >= self.limit:
+                return False
+            self.used += 1
+            return True
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.limit - self.used)
+
+
+class RedisRetryBudget(RetryBudget):
+    """
+    Shares one retry budget between all worker processes through Redis.
+
+    Retries are counted under the current budget epoch. reset() starts a new
+    epoch named after the run, and an epoch expires after the window. When
+    Redis is unreachable, each process falls back to its own local budget.
+    """
+    EPOCH_KEY = 'retry_budget:epoch'
+
+    def __init__(self, client: redis.Redis, limit: int, window: float):
+        super().__init__(limit, window)
+        self.redis = client
+        self._consume = client.register_script(CONSUME_SCRIPT)
+
+    def reset(self, run_id: str = None):
+        super().reset()
+        try:
+            self.redis.set(self.EPOCH_KEY, run_id or uuid.uuid4().hex, ex=int(self.window))
+        except redis.RedisError as e:
+            logger.warning(f"Could not start a shared retry budget, using the local one. Error: {e}")
+
+    def consume(self) -> bool:
+        try:
+            return bool(self._consume(keys=[self.EPOCH_KEY], args=[self.limit, int(self.window), uuid.uuid4().hex]))
+        except redis.RedisError as e:
+            logger.warning(f"Shared retry budget unavailable, using the local one. Error: {e}")
+            return super().consume()
+
+
+if RETRY_BUDGET_BACKEND == 'redis':
+    retry_budget = RedisRetryBudget(
+        redis.Redis.from_url(CELERY_BROKER_URL, socket_timeout=2, socket_connect_timeout=2),
+        RETRY_BUDGET_PER_RUN, RETRY_BUDGET_WINDOW_SECONDS
+    )
+else:
+    retry_budget = RetryBudget(RETRY_BUDGET_PER_RUN, RETRY_BUDGET_WINDOW_SECONDS)
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, Retry-After honoring and a shared retry budget."""
+    def __init__(self, max_attempts: int, base_delay: float, max_delay: float, budget: RetryBudget = retry_budget):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+
+    @classmethod
+    def for_model(cls, name: str) -> 'RetryPolicy':
+        options = {**RETRY_POLICIES['default'], **RETRY_POLICIES.get(name, {})}
+        return cls(**options)
+
+    def is_retryable(self, e: Exception) -> bool:
+        if isinstance(e, RETRYABLE_ERRORS):
+            return True
+        return isinstance(e, openai.APIStatusError) and e.status_code in RETRYABLE_STATUS_CODES
+
+    def should_retry(self, e: Exception, attempt: int, key_available: bool = False) -> bool:
+        """Decides whether a failed attempt (0-based) is retried; key errors are retried only on another healthy key."""
+        if attempt + 1 >= self.max_attempts:
+            return False
+        if not (self.is_retryable(e) or (key_available and isinstance(e, KEY_ERRORS))):
+            return False
+        if not self.budget.consume():
+            logger.warning(f"Retry budget of {self.budget.limit} exhausted, not retrying {type(e).__name__}.")
+            return False
+        return True
+
+    def delay(self, e: Exception, attempt: int, key_available: bool = False) -> float:
+        """Seconds to wait before the next attempt."""
+        if key_available and isinstance(e, KEY_ERRORS + (openai.RateLimitError,)):
+            return 0.0
+        retry_after = parse_retry_after(e)
+        if retry_after is not None:
+            return min(retry_after, RETRY_AFTER_MAX_SECONDS)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
@@ -0,0 +1,72 @@
+import datetime
+import logging
+from app.extensions import db
+from app.models import EvaluationRun
+
+logger = logging.getLogger('runs')
+
+
+def start_run(run_id: str, expected: int) -> EvaluationRun:
+    """Registers a run expecting `expected` (model, question) units; committed before any unit is dispatched."""
+    run = EvaluationRun(id=run_id, expected=expected, started_at=datetime.datetime.now())
+    db.session.add(run)
+    db.session.commit()
+    logger.info(f"Started evaluation run {run_id} with {expected} units.")
+    return run
+
+
+def record_units(run_id: str | None, completed: int = 0, failed: int = 0) -> bool:
+    """
+    Atomically counts finished units of a run and commits. Returns True for exactly one caller:
+    the one whose update finished the run, which then fires the snapshot. Unknown run ids are ignored.
+    """
+    if not run_id or not (completed or failed):
+        return False
+    updated = EvaluationRun.query.filter_by(id=run_id).update({
+        EvaluationRun.completed: EvaluationRun.completed + completed,
+        EvaluationRun.failed: EvaluationRun.failed + failed
+    }, synchronize_session=False)
+    if not updated:
+        db.session.commit()
+        return False
+    finished = EvaluationRun.query.filter(
+        EvaluationRun.id == run_id,
+        EvaluationRun.status == 'running',
+        EvaluationRun.completed + EvaluationRun.failed >= EvaluationRun.expected
+    ).update({
+        EvaluationRun.status: 'finished',
+        EvaluationRun.finished_at: datetime.datetime.now()
+    }, synchronize_session=False)
+    db.session.commit()
+    if finished:
+        logger.info(f"Evaluation run {run_id} finished all its units.")
+    return bool(finished)
+
+
+def run_progress(run: EvaluationRun, now: datetime.datetime = None) -> dict:
+    """Progress of a run with its throughput in units per minute and, while running, the estimated time left."""
+    now = now or datetime.datetime.now()
+    done = run.completed + run.failed
+    elapsed = ((run.finished_at or now) - run.started_at).total_seconds()
+    per_minute = done * 60 / elapsed if elapsed > 0 else 0.0
+    eta = None
+    if run.status == 'running' and per_minute > 0:
+        eta = (run.expected - done) * 60 / per_minute
+    return {
+        'run_id': run.id,
+        'status': run.status,
+        'expected': run.expected,
+        'completed': run.completed,
+        'failed': run.failed,
+        'percent': 100.0 * done / run.expected if run.expected else 100.0,
+        'started_at': run.started_at,
+        'finished_at': run.finished_at,
+        'per_minute': per_minute,
+        'eta_seconds': eta,
+        'history_id': run.history_id
+    }
+
+
+def recent_runs(limit: int = 10) -> list[dict]:
+    runs = EvaluationRun.query.order_by(EvaluationRun.started_at.desc()).limit(limit).all()
+    return [run_progress(run) for run in runs]
@@ -0,0 +1,135 @@
+import logging
+from sqlalchemy import event, select, case, func
+from app.extensions import db
+from app.models import Rating, Answer, Question, Dimension, ScoreAggregate
+from app.core.leaderboard_cache import bump_data_version
+
+logger = logging.getLogger('score_aggregates')
+
+aggregate_table = ScoreAggregate.__table__
+
+
+def _parents(connection) -> dict[int, int | None]:
+    return dict(connection.execute(select(Dimension.id, Dimension.parent)).all())
+
+
+def _grouped_ratings(answer_filter=None):
+    """Rating sums per (answer llm, question dimension, question type), optionally limited to some answers."""
+    query = select(
+        Answer.llm_id,
+        Question.dimension_id,
+        Question.question_type,
+        func.sum(Rating.score),
+        func.count(Rating.id),
+        func.sum(case((Rating.is_responsive, 1), else_=0))
+    ).select_from(Rating)\
+     .join(Answer, Rating.answer_id == Answer.id)\
+     .join(Question, Answer.question_id == Question.id)
+    if answer_filter is not None:
+        query = query.where(answer_filter)
+    return query.group_by(Answer.llm_id, Question.dimension_id, Question.question_type)
+
+
+def _deltas(parents: dict, rows, sign: int) -> dict[tuple, list]:
+    """Spreads per-dimension rating sums onto the dimension and each of its ancestors."""
+    deltas = {}
+    for llm_id, dimension_id, question_type, score_total, rating_count, responsive_count in rows:
+        seen = set()
+        while dimension_id in parents and dimension_id not in seen:
+            seen.add(dimension_id)
+            delta = deltas.setdefault((llm_id, dimension_id, question_type), [0.0, 0, 0])
+            delta[0] += sign * (score_total or 0.0)
+            delta[1] += sign * rating_count
+            delta[2] += sign * (responsive_count or 0)
+            dimension_id = parents[dimension_id]
+    return deltas
+
+
+def _apply(connection, deltas: dict[tuple, list]):
+    # SQLite holds the write lock for the whole transaction, so no other writer can insert the row in between
+    for (llm_id, dimension_id, question_type), (score_total, rating_count, responsive_count) in deltas.items():
+        key = (
+            (aggregate_table.c.llm_id == llm_id)
+            & (aggregate_table.c.dimension_id == dimension_id)
+            & (aggregate_table.c.question_type == question_type)
+        )
+        updated = connection.execute(aggregate_table.update().where(key).values(
+            score_total=aggregate_table.c.score_total + score_total,
+            rating_count=aggregate_table.c.rating_count + rating_count,
+            responsive_count=aggregate_table.c.responsive_count + responsive_count
+        )).rowcount
+        if not updated:
+            connection.execute(aggregate_table.insert().values(
+                llm_id=llm_id, dimension_id=dimension_id, question_type=question_type,
+                score_total=score_total, rating_count=rating_count, responsive_count=responsive_count
+            ))
+
+
+def _apply_rating(connection, answer_id: int, score: float, is_responsive: bool, sign: int):
+    row = connection.execute(
+        select(Answer.llm_id, Question.dimension_id, Question.question_type)
+        .join(Question, Answer.question_id == Question.id)
+        .where(Answer.id == answer_id)
+    ).first()
+    if row is None:
+        return
+    rows = [(row.llm_id, row.dimension_id, row.question_type, score, 1, 1 if is_responsive else 0)]
+    _apply(connection, _deltas(_parents(connection), rows, sign))
+
+
+@event.listens_for(Rating, 'after_insert')
+def _rating_inserted(mapper, connection, target):
+    _apply_rating(connection, target.answer_id, target.score, target.is_responsive, 1)
+
+
+@event.listens_for(Rating, 'before_delete')
+def _rating_deleted(mapper, connection, target):
+    _apply_rating(connection, target.answer_id, target.score, target.is_responsive, -1)
+
+
+@event.listens_for(Rating, 'before_update')
+def _rating_updating(mapper, connection, target):
+    # 旧值从数据库读取：提交后对象已过期，修改属性时不会记录旧值
+    old = connection.execute(
+        select(Rating.answer_id, Rating.score, Rating.is_responsive).where(Rating.id == target.id)
+    ).first()
+    if old is None or (old.answer_id, old.score, bool(old.is_responsive)) == (target.answer_id, target.score, bool(target.is_responsive)):
+        return
+    _apply_rating(connection, old.answer_id, old.score, old.is_responsive, -1)
+    _apply_rating(connection, target.answer_id, target.score, target.is_responsive, 1)
+
+
+def discount_answers(answer_ids):
+    """
+    Subtracts the ratings of answers that are about to be bulk-deleted, since bulk deletes skip the
+    mapper events. Call it in the same transaction, before the delete. `answer_ids` may be a subquery.
+    """
+    connection = db.session.connection()
+    rows = connection.execute(_grouped_ratings(Answer.id.in_(answer_ids))).all()
+    _apply(connection, _deltas(_parents(connection), rows, -1))
+
+
+def rebuild_score_aggregates() -> int:
+    """Recomputes all aggregates from the ratings and commits. Returns the number of aggregate rows."""
+    connection = db.session.connection()
+    connection.execute(aggregate_table.delete())
+    deltas = _deltas(_parents(connection), connection.execute(_grouped_ratings()).all(), 1)
+    if deltas:
+        connection.execute(aggregate_table.insert(), [
+            {
+                'llm_id': llm_id, 'dimension_id': dimension_id, 'question_type': question_type,
+                'score_total': score_total, 'rating_count': rating_count, 'responsive_count': responsive_count
+            }
+            for (llm_id, dimension_id, question_type), (score_total, rating_count, responsive_count) in deltas.items()
+        ])
+    bump_data_version(connection)
+    db.session.commit()
+    logger.info(f"Rebuilt {len(deltas)} score aggregate rows from all ratings.")
+    return len(deltas)
+
+
+def ensure_score_aggregates():
+    """Builds the aggregates once for a database that has ratings but no aggregates yet."""
+    if ScoreAggregate.query.first() is None and Rating.query.first() is not None:
+        logger.info("Score aggregates are empty while ratings exist. Building them now.")
+        rebuild_score_aggregates()
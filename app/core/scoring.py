@@ -0,0 +1,275 @@
+import re
+import json
+import math
+import threading
+import unicodedata
+import logging
+from app.core.constants import (
+    SCORE_CLAMP_MARGIN,
+    SCORE_EXTRACTION_LOG_INTERVAL,
+    OBJECTIVE_REFUSAL_PHRASES
+)
+
+logger = logging.getLogger('scoring')
+
+CHINESE_DIGITS = {'零': 0, '〇': 0, '一': 1, '二': 2, '两': 2, '三': 3, '四': 4, '五': 5, '六': 6, '七': 7, '八': 8, '九': 9}
+NUMBER = r'(\d+(?:\.\d+)?|[零〇一二两三四五六七八九十]+(?:点[零〇一二三四五六七八九])?)'
+
+# 按优先级排列：带"评分/得分"等前缀的数字、"x/5"形式、"x分"（排除"满分5分"与"5分制"）
+SCORE_PATTERNS = [
+    re.compile(r'(?:评分|得分|分数|打分|score)\s*(?:为|是|[:：])?\s*' + NUMBER, re.IGNORECASE),
+    re.compile(NUMBER + r'\s*/\s*\d+'),
+    re.compile(r'(?<!满分)(?<!满)(?<![\d.零〇一二两三四五六七八九十点])' + NUMBER + r'\s*分(?!制)'),
+]
+# "满分N分"与"N分制"说明的是分数范围而不是得分
+SCALE_MENTIONS = re.compile(r'满分\s*' + NUMBER + r'\s*分?|' + NUMBER + r'\s*分制')
+# 兜底只认阿拉伯数字：汉字数字常出现在普通词语中，如"一定""一个"
+ARABIC_NUMBER = re.compile(r'(?<![\d.])\d+(?:\.\d+)?')
+THINK_BLOCK = re.compile(r'<think>.*?</think>', re.DOTALL)
+
+# 客观题回复中的选项字母：整条回复只有一个字母（可带括号与标点）、"答案是B"一类的表述、以"B."开头（字母后是空格不算，以免把英文冠词"A"当作选项）
+CHOICE_ONLY = re.compile(r'^[(\[【「]?\s*([A-Da-d])\s*[)\]】」]?[.。、:：,，!！]?$')
+CHOICE_STATEMENT = re.compile(r'(?:答案|选择|选项|应选|选|answer)\s*(?:是|为|应为|应该是|:|：|is)?\s*[(\[【「]?\s*([A-D])(?![A-Za-z])', re.IGNORECASE)
+CHOICE_PREFIX = re.compile(r'^([A-D])(?:[.、:：)\]】]|$)')
+STANDALONE_CHOICE = re.compile(r'(?<![A-Za-z])([A-D])(?![A-Za-z])')
+MARKDOWN_NOISE = re.compile(r'[*_`#>"\'“”‘’]')
+
+
+def parse_number(text: str) -> float | None:
+    """Parses an Arabic number or a small Chinese numeral such as '四', '十' or '三点五'."""
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    integer, _, fraction = text.partition('点')
+    if '十' in integer:
+        tens, _, ones = integer.partition('十')
+        if len(tens) > 1 or len(ones) > 1:
+            return None
+        value = CHINESE_DIGITS.get(tens, 1 if not tens else None), CHINESE_DIGITS.get(ones, 0 if not ones else None)
+        if None in value:
+            return None
+        number = value[0] * 10 + value[1]
+    elif len(integer) == 1 and integer in CHINESE_DIGITS:
+        number = CHINESE_DIGITS[integer]
+    else:
+        return None
+    if fraction:
+        if fraction not in CHINESE_DIGITS:
+            return None
+        number += CHINESE_DIGITS[fraction] / 10
+    return float(number)
+
+
+class ScoreExtraction:
+    """A parsed rater reply. `strict` tells whether the old float() parser would have accepted it without a retry."""
+    def __init__(self, score: float | None, method: str, strict: bool = False):
+        self.score = score
+        self.method = method
+        self.strict = strict
+
+    @property
+    def ok(self) -> bool:
+        return self.score is not None
+
+    def __repr__(self):
+        return f'<ScoreExtraction {self.score} via {self.method}>'
+
+
+def _clamp(value: float, total_score: float) -> float | None:
+    """Clamps values slightly outside [0, total_score]; anything further out is rejected."""
+    if 0 <= value <= total_score:
+        return value
+    if -SCORE_CLAMP_MARGIN <= value < 0:
+        return 0.0
+    if total_score < value <= total_score + SCORE_CLAMP_MARGIN:
+        return float(total_score)
+    return None
+
+
+def _json_number(value) -> float | None:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        return parse_number(value.strip())
+    return None
+
+
+def _from_json(text: str) -> float | None:
+    match = re.search(r'\{.*\}', text, re.DOTALL)
+    if not match:
+        return None
+    try:
+        data = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    return _json_number(data.get('score'))
+
+
+def _from_text(text: str) -> float | None:
+    text = SCALE_MENTIONS.sub(' ', text)
+    for pattern in SCORE_PATTERNS:
+        match = pattern.search(text)
+        # "十分"多为副词"非常"
+        if match and match.group(1) != '十':
+            return parse_number(match.group(1))
+    numbers = set(ARABIC_NUMBER.findall(text))
+    if len(numbers) == 1:
+        return float(numbers.pop())
+    return None
+
+
+def score_from_logprobs(top_logprobs: list[tuple[str, float]], total_score: float) -> float | None:
+    """Expected score over the digit tokens among the first token's top alternatives, renormalized."""
+    weights = {}
+    for token, logprob in top_logprobs:
+        value = parse_number(token.strip())
+        if value is not None and value == int(value) and 0 <= value <= total_score:
+            weights[value] = weights.get(value, 0.0) + math.exp(logprob)
+    total = sum(weights.values())
+    if total <= 0:
+        return None
+    return sum(value * weight for value, weight in weights.items()) / total
+
+
+def extract_score(text: str, total_score: float, top_logprobs: list[tuple[str, float]] = None) -> ScoreExtraction:
+    """
+    Extracts a score in [0, total_score] from a rater reply: logprobs first when given,
+    then a bare number, a JSON object with a 'score' field and finally number patterns in free text.
+    """
+    text = text or ''
+    try:
+        value = float(text)
+    except (ValueError, TypeError):
+        value = None
+    strict = value is not None and 0 <= value <= total_score
+
+    if top_logprobs:
+        score = score_from_logprobs(top_logprobs, total_score)
+        if score is not None:
+            return ScoreExtraction(score, 'logprobs', strict)
+    if strict:
+        return ScoreExtraction(value, 'strict', strict)
+
+    stripped = THINK_BLOCK.sub('', text).strip()
+    for method, parse in (('number', parse_number), ('json', _from_json), ('text', _from_text)):
+        candidate = value if method == 'number' and value is not None else parse(stripped)
+        if candidate is None:
+            continue
+        score = _clamp(candidate, total_score)
+        if score is not None:
+            return ScoreExtraction(score, method if score == candidate else f'{method}_clamped')
+        return ScoreExtraction(None, f'{method}_out_of_range')
+    return ScoreExtraction(None, 'unparsed')
+
+
+def extract_batch_scores(text: str, count: int, total_score: float) -> dict[int, float]:
+    """
+    Valid scores by 0-based item index from a batch rating reply: a JSON array of
+    {"id": n, "score": x} objects (ids starting at 1), or of bare scores in order.
+    Missing, duplicated or out-of-range items are left out for the caller to rate again.
+    """
+    match = re.search(r'\[.*\]', THINK_BLOCK.sub('', text or ''), re.DOTALL)
+    if not match:
+        return {}
+    try:
+        items = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(items, list):
+        return {}
+
+    if all(isinstance(item, dict) for item in items):
+        pairs = [(_json_number(item.get('id')), item.get('score')) for item in items]
+        pairs = [(int(index) - 1, value) for index, value in pairs if index is not None and index == int(index)]
+    elif len(items) == count:
+        pairs = list(enumerate(items))
+    else:
+        return {}
+
+    indices = [index for index, _ in pairs]
+    scores = {}
+    for index, value in pairs:
+        if not 0 <= index < count or indices.count(index) > 1:
+            continue
+        value = _json_number(value)
+        score = _clamp(value, total_score) if value is not None else None
+        if score is not None:
+            scores[index] = score
+    return scores
+
+
+def normalize_reply(text: str) -> str:
+    """Full-width to half-width, without <think> blocks, markdown emphasis and quotes."""
+    text = unicodedata.normalize('NFKC', text or '')
+    return MARKDOWN_NOISE.sub('', THINK_BLOCK.sub('', text)).strip()
+
+
+def extract_choice(text: str) -> str | None:
+    """
+    The single choice letter an objective reply commits to, or None when there is none or it is
+    ambiguous, e.g. a longer reply that mentions more than one option.
+    """
+    match = CHOICE_ONLY.match(text)
+    if match:
+        return match.group(1).upper()
+    if len(set(STANDALONE_CHOICE.findall(text))) > 1:
+        return None
+    letters = {letter.upper() for letter in CHOICE_STATEMENT.findall(text)}
+    if len(letters) == 1:
+        return letters.pop()
+    match = CHOICE_PREFIX.match(text)
+    return match.group(1) if match else None
+
+
+def judge_objective(reply: str, answer_key: str) -> tuple[str | None, str | None]:
+    """
+    Rule-based verdict on an objective reply: 'correct', 'wrong', 'refusal' or 'empty', with the extracted letter.
+    The verdict is None when the reply (or the answer key) is ambiguous and needs an LLM rater.
+    """
+    key = normalize_reply(answer_key).upper().rstrip('.。')
+    if len(key) != 1 or key not in 'ABCD':
+        return None, None
+    text = normalize_reply(reply)
+    if not text:
+        return 'empty', None
+
+    choice = extract_choice(text)
+    refused = any(phrase.lower() in text.lower() for phrase in OBJECTIVE_REFUSAL_PHRASES)
+    if choice is not None and not refused:
+        return ('correct' if choice == key else 'wrong'), choice
+    if choice is None and refused:
+        return 'refusal', None
+    return None, choice
+
+
+class ExtractionStats:
+    """Counts rater replies the strict parser would have rejected but extraction rescued, i.e. retries saved."""
+    def __init__(self, log_interval: int):
+        self.log_interval = log_interval
+        self.replies = 0
+        self.rescued = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def record(self, extraction: ScoreExtraction):
+        with self._lock:
+            self.replies += 1
+            if extraction.ok and not extraction.strict:
+                self.rescued += 1
+            elif not extraction.ok:
+                self.failed += 1
+            if self.replies % self.log_interval == 0:
+                logger.info(
+                    f"Score extraction: {self.rescued}/{self.replies} rater replies ({self.rescued / self.replies:.1%}) "
+                    f"would have needed a retry with strict parsing; {self.failed} still unparseable."
+                )
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {'replies': self.replies, 'rescued': self.rescued, 'failed': self.failed}
+
+
+extraction_stats = ExtractionStats(SCORE_EXTRACTION_LOG_INTERVAL)
@@ -0,0 +1,122 @@
+import threading
+import hashlib
+import json
+import time
+import uuid
+import logging
+import redis
+from app.core.constants import (
+    SINGLEFLIGHT_LOCK_TIMEOUT,
+    SINGLEFLIGHT_RESULT_TTL,
+    SINGLEFLIGHT_POLL_INTERVAL
+)
+
+logger = logging.getLogger('singleflight')
+
+
+def make_key(model_id: int, prompt: str, params: dict = None) -> str:
+    payload = json.dumps([model_id, prompt, params or {}], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key inside this process.
+
+    The first caller (the leader) runs the function; callers arriving while it
+    is in flight wait for and share its result instead of running it again.
+    """
+    def __init__(self):
+        self._calls: dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self.shared = 0
+
+    def do(self, key: str, fn) -> tuple[object, bool]:
+        """Returns fn()'s result and whether it was shared from another caller's in-flight call."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result, shared = self._run(key, fn)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result, shared
+
+    def _run(self, key: str, fn) -> tuple[object, bool]:
+        return fn(), False
+
+
+class RedisSingleFlight(SingleFlight):
+    """
+    Extends in-process coalescing across workers through Redis.
+
+    The process that wins SET NX on the lock key runs the call and publishes the
+    serialized result; other processes poll for it. A stored result is checked
+    before and right after taking the lock and is never deleted, so a waiter
+    only takes over the call when the leader died or failed without a result.
+    Only results that `serialize` accepts are shared between processes.
+    """
+    def __init__(self, url: str, serialize, deserialize):
+        super().__init__()
+        self.redis = redis.Redis.from_url(url)
+        self.serialize = serialize
+        self.deserialize = deserialize
+
+    def _run(self, key: str, fn) -> tuple[object, bool]:
+        lock_key, result_key = f'singleflight:{key}:lock', f'singleflight:{key}:result'
+        token = uuid.uuid4().hex
+        try:
+            while True:
+                payload = self.redis.get(result_key)
+                if payload is None and self.redis.set(lock_key, token, nx=True, ex=SINGLEFLIGHT_LOCK_TIMEOUT):
+                    # 上一个领头者可能在两次读取之间存入结果并释放了锁
+                    payload = self.redis.get(result_key)
+                    if payload is None:
+                        break
+                    self._release(lock_key, token)
+                if payload is not None:
+                    self.shared += 1
+                    return self.deserialize(payload), True
+                time.sleep(SINGLEFLIGHT_POLL_INTERVAL)
+        except redis.RedisError as e:
+            logger.warning(f"Redis singleflight unavailable, running call without cross-process coalescing. Error: {e}")
+            return fn(), False
+
+        try:
+            result = fn()
+            payload = self.serialize(result)
+            if payload is not None:
+                self.redis.set(result_key, payload, ex=SINGLEFLIGHT_RESULT_TTL)
+            return result, False
+        finally:
+            self._release(lock_key, token)
+
+    def _release(self, lock_key: str, token: str):
+        try:
+            if self.redis.get(lock_key) == token.encode():
+                self.redis.delete(lock_key)
+        except redis.RedisError as e:
+            logger.warning(f"Could not release singleflight lock {lock_key}. Error: {e}")
@@ -1,19 +1,51 @@
 import logging
 from app.extensions import db
-from app.models import Question, Answer, Setting, LLM, Rating
-from app.core.constants import DEFAULT_CRITERIA, QUESTION_TEMPLATE, RATERS, DEFAULT_TOTAL_SCORE
+from app.models import Question, Answer, Setting, LLM, Rating, LLMCall, EvaluationRun
+from app.core.constants import (
+    DEFAULT_CRITERIA, QUESTION_TEMPLATE, RATERS, DEFAULT_TOTAL_SCORE, ASYNC_FANOUT, RATING_BATCH_ENABLED,
+    CELERY_BROKER_URL, GENERATION_QUEUE, RATING_QUEUE, PROVIDER_SLOT_RETRY_DELAY, ASYNC_MAX_CONCURRENCY, CHUNK_SIZE
+)
 from app.core.llm import clients
+from app.core.retry import retry_budget
+from app.core.usage import record_call, budget_exceeded
+from app.core.queues import record_completion, provider_group, provider_queue, provider_slots
+from app.core.runs import start_run, record_units
+from app.core.score_aggregates import discount_answers
 from celery import Celery, group, chord
 from celery.schedules import crontab
-from celery.signals import after_setup_logger, worker_process_init
-from app.core.utils import setup_logging, rate_answer, generate_leaderboard_data, convert_markdown_to_pdf
+from celery.signals import after_setup_logger, worker_process_init, task_postrun
+from celery.exceptions import Retry
+from app.core.utils import setup_logging, rate_answer, rate_answers_batch, failed_answer_filter, generate_leaderboard_data, cached_leaderboard_data, convert_markdown_to_pdf
 from app.core.report_export import export_report
 import time
+import uuid
 from pathlib import Path
 
 logger = logging.getLogger('celery_tasks')
 
-celery = Celery('tasks', broker='redis://localhost:6379/0', backend='redis://localhost:6379/0')
+celery = Celery('tasks', broker=CELERY_BROKER_URL, backend=CELERY_BROKER_URL)
+
+# 生成与评分各用一个队列，其余任务留在默认队列celery；生成任务再按服务商路由，见PROVIDER_QUEUES
+STAGE_ROUTES = {
+    'app.core.tasks.process_single_model': {'queue': GENERATION_QUEUE},
+    'app.core.tasks.process_model_chunk': {'queue': GENERATION_QUEUE},
+    'app.core.tasks.rate_answer_task': {'queue': RATING_QUEUE},
+    'app.core.tasks.rate_answers_task': {'queue': RATING_QUEUE},
+    'app.core.tasks.rate_question_task': {'queue': RATING_QUEUE},
+}
+
+def model_provider(model_id):
+    """Provider group of a model, from the client registry of this process."""
+    client = clients.clients.get(model_id)
+    return provider_group(client.name, client.base_url) if client else None
+
+def route_task(name, args, kwargs, options, task=None, **kw):
+    if name in ('app.core.tasks.process_single_model', 'app.core.tasks.process_model_chunk'):
+        group = model_provider(args[0] if args else kwargs.get('model_id'))
+        return {'queue': provider_queue(group) if group else GENERATION_QUEUE}
+    return STAGE_ROUTES.get(name)
+
+celery.conf.task_routes = (route_task,)
 
 _flask_app = None
 
@@ -47,101 +79,398 @@ class ContextTask(celery.Task):
 
 celery.Task = ContextTask
 
+@task_postrun.connect
+def count_stage_completion(sender=None, **kwargs):
+    """Feeds the throughput counters of the generation, provider and rating queues."""
+    route = STAGE_ROUTES.get(getattr(sender, 'name', None))
+    if route:
+        delivery_info = getattr(sender.request, 'delivery_info', None) or {}
+        record_completion(delivery_info.get('routing_key') or route['queue'])
+
 @after_setup_logger.connect
 def setup_celery_logging(logger, **kwargs):
     setup_logging()
     logging.info("Celery worker logger configured.")
 
+def build_answer(question_id, llm_id, result):
+    """An Answer for a generation result; failed generations keep their error string and are never rated."""
+    return Answer(
+        question_id=question_id,
+        llm_id=llm_id,
+        content=result.content,
+        status='ok' if result.ok else 'failed',
+        error=result.error
+    )
+
+def clear_answers(question_ids):
+    """Deletes all answers to the questions and their ratings, keeping the usage records of their calls."""
+    answer_ids_to_delete = db.session.query(Answer.id).filter(Answer.question_id.in_(question_ids)).scalar_subquery()
+    discount_answers(answer_ids_to_delete)
+    LLMCall.query.filter(LLMCall.answer_id.in_(answer_ids_to_delete))\
+        .update({LLMCall.answer_id: None, LLMCall.rating_id: None}, synchronize_session=False)
+    Rating.query.filter(Rating.answer_id.in_(answer_ids_to_delete)).delete(synchronize_session=False)
+    Answer.query.filter(Answer.question_id.in_(question_ids)).delete(synchronize_session=False)
+    db.session.commit()
+
+def evaluated_llms():
+    """All models except the raters."""
+    rater_names = [rater for raters in RATERS.values() for rater in raters]
+    return LLM.query.filter(LLM.name.notin_(rater_names)).all()
+
+def chunked(items, size=CHUNK_SIZE):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def finish_units(run_id, completed=0, failed=0):
+    """Counts finished (model, question) units of a run and fires the history snapshot once the last one is in."""
+    if record_units(run_id, completed, failed):
+        save_evaluation_history_task.delay(run_id)
+
+class RunUnits:
+    """
+    The units of a run a task is responsible for. Units are either counted here or handed off to a task
+    that was queued successfully; when the task raises, the rest are counted as failed, so a crashed
+    task cannot keep its run from finishing. Celery retries are not failures.
+    """
+    def __init__(self, run_id, units, suppress=False):
+        self.run_id = run_id
+        self.remaining = units
+        self.suppress = suppress
+
+    def finish(self, completed=0, failed=0):
+        self.remaining -= completed + failed
+        finish_units(self.run_id, completed, failed)
+
+    def hand_off(self, units):
+        self.remaining -= units
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None or issubclass(exc_type, Retry):
+            return False
+        db.session.rollback()
+        logger.error(f"Task failed with {self.remaining} unfinished units of run {self.run_id}: {exc!r}", exc_info=(exc_type, exc, tb))
+        if self.remaining > 0:
+            finish_units(self.run_id, failed=self.remaining)
+            self.remaining = 0
+        return self.suppress and issubclass(exc_type, Exception)
+
 @celery.task
-def process_question(question_id):
+def process_question(question_id, use_cache=True, run_id=None):
     logger.info(f"--- [Master Task] FORCING REGENERATION for Question ID: {question_id} ---")
     
     question = db.session.get(Question, question_id)
     if not question:
         logger.error(f"[Master Task] Failed: Could not find Question with ID {question_id}.")
+        finish_units(run_id, failed=len(evaluated_llms()))
         return
 
-    answer_ids_to_delete = db.session.query(Answer.id).filter(Answer.question_id == question_id).scalar_subquery()
-    logger.info(f"[Master Task] Deleting ALL old ratings for Question ID: {question_id}.")
-    Rating.query.filter(Rating.answer_id.in_(answer_ids_to_delete)).delete(synchronize_session=False)
-
-    logger.info(f"[Master Task] Deleting ALL old answers for Question ID: {question_id}.")
-    Answer.query.filter_by(question_id=question_id).delete(synchronize_session=False)
-    
-    db.session.commit()
-    logger.info(f"[Master Task] Old data cleared successfully for Question ID: {question_id}.")
-    
     rater_llms_all = LLM.query.filter(LLM.name.in_([rater for raters in RATERS.values() for rater in raters])).all()
     rater_ids_all = {rater.id for rater in rater_llms_all}
     logger.info(f"[Master Task] Rater model IDs to be excluded: {rater_ids_all}")
 
     llms_to_process = LLM.query.filter(LLM.id.notin_(rater_ids_all)).all()
-    if not llms_to_process:
-        logger.warning(f"[Master Task] No models to process for Question ID {question_id} after excluding raters.")
-        return
 
-    job = group(
-        process_single_model.s(llm.id, question.id) for llm in llms_to_process
-    )
-    job.apply_async()
+    with RunUnits(run_id, len(llms_to_process)) as units:
+        logger.info(f"[Master Task] Deleting ALL old answers and ratings for Question ID: {question_id}.")
+        clear_answers([question_id])
+        logger.info(f"[Master Task] Old data cleared successfully for Question ID: {question_id}.")
+
+        if not llms_to_process:
+            logger.warning(f"[Master Task] No models to process for Question ID {question_id} after excluding raters.")
+            return
+
+        if ASYNC_FANOUT:
+            process_question_concurrently(question, llms_to_process, use_cache, run_id, units)
+            return
+
+        if RATING_BATCH_ENABLED:
+            job = chord(
+                (process_single_model.s(llm.id, question.id, use_cache, run_id, False) for llm in llms_to_process),
+                rate_question_task.si(question.id, use_cache, run_id)
+            )
+        else:
+            job = group(
+                process_single_model.s(llm.id, question.id, use_cache, run_id) for llm in llms_to_process
+            )
+        job.apply_async()
+        units.hand_off(len(llms_to_process))
     
     logger.info(f"[Master Task] All sub-tasks for Question ID {question_id} have been queued for fresh generation.")
+
+def process_question_concurrently(question, llms_to_process, use_cache=True, run_id=None, units=None):
+    """Asks all models at once through the async client layer, saving answers as they arrive, then rates them."""
+    units = units or RunUnits(run_id, len(llms_to_process))
+    if budget_exceeded(run_id):
+        logger.warning(f"[Master Task] Run {run_id} is over budget. Skipping Question ID {question.id}.")
+        units.finish(failed=len(llms_to_process))
+        return
+
+    question_prompt = QUESTION_TEMPLATE[question.question_type].format(question.content)
+    target_ids = {llm.id for llm in llms_to_process}
+    exclusions = [i for i in clients.clients if i not in target_ids]
+
+    answers = []
+    def save_answer(llm_id, result):
+        answer = build_answer(question.id, llm_id, result)
+        db.session.add(answer)
+        record_call(result, llm_id, 'generation', run_id, answer=answer)
+        db.session.commit()
+        if not result.ok:
+            logger.warning(f"[Master Task] Generation failed for Model ID: {llm_id} ({result.error}). Saved Answer ID: {answer.id} without rating.")
+            return
+        answers.append(answer)
+        logger.info(f"[Master Task] Saved Answer ID: {answer.id} for Model ID: {llm_id}.")
+
+    clients.complete_many(question_prompt, exclusions, on_result=save_answer, use_cache=use_cache, profile=question.question_type)
+    units.finish(failed=len(llms_to_process) - len(answers))
+
+    if RATING_BATCH_ENABLED:
+        rate_question_task.delay(question.id, use_cache, run_id)
+        units.hand_off(len(answers))
+    else:
+        for answer in answers:
+            rate_answer_task.delay(answer.id, use_cache, run_id)
+            units.hand_off(1)
+    logger.info(f"[Master Task] Generated {len(answers)} answers concurrently for Question ID {question.id} and queued their rating.")
     
-@celery.task
-def process_single_model(model_id, question_id):
+@celery.task(bind=True, max_retries=None)
+def process_single_model(self, model_id, question_id, use_cache=True, run_id=None, rate=True):
     logger.info(f"[Sub-Task] Started for Model ID: {model_id}, Question ID: {question_id}.")
     
-    question = db.session.get(Question, question_id)
-    llm = db.session.get(LLM, model_id)
-    if not question or not llm:
-        logger.error(f"[Sub-Task] Failed: Could not find Question {question_id} or LLM {model_id}.")
-        return
+    # 和弦中的子任务抛出异常会使批量评分回调不再执行，因此rate=False时计为失败后不再抛出
+    with RunUnits(run_id, 1, suppress=not rate) as units:
+        question = db.session.get(Question, question_id)
+        llm = db.session.get(LLM, model_id)
+        if not question or not llm:
+            logger.error(f"[Sub-Task] Failed: Could not find Question {question_id} or LLM {model_id}.")
+            units.finish(failed=1)
+            return
 
-    question_prompt = QUESTION_TEMPLATE[question.question_type].format(question.content)
-    response_content = clients.generate_response(question_prompt, llm.id)
+        if budget_exceeded(run_id):
+            logger.warning(f"[Sub-Task] Run {run_id} is over budget. Skipping Model ID: {model_id}, Question ID: {question_id}.")
+            units.finish(failed=1)
+            return
+
+        provider = provider_group(llm.name, llm.base_url)
+        slot = provider_slots.acquire(provider)
+        if slot is None:
+            logger.info(f"[Sub-Task] Provider {provider} is at its in-flight cap. Requeueing Model ID: {model_id}, Question ID: {question_id}.")
+            raise self.retry(countdown=PROVIDER_SLOT_RETRY_DELAY)
+
+        question_prompt = QUESTION_TEMPLATE[question.question_type].format(question.content)
+        try:
+            result = clients.complete(question_prompt, llm.id, use_cache, profile=question.question_type)
+        finally:
+            provider_slots.release(provider, slot)
     
-    answer = Answer(
-        question_id=question.id,
-        llm_id=llm.id,
-        content=response_content
-    )
-    db.session.add(answer)
-    db.session.commit()
-    logger.info(f"[Sub-Task] Generated and saved Answer ID: {answer.id} for Model ID: {model_id}.")
+        answer = build_answer(question.id, llm.id, result)
+        db.session.add(answer)
+        record_call(result, llm.id, 'generation', run_id, answer=answer)
+        db.session.commit()
+
+        if not result.ok:
+            logger.warning(f"[Sub-Task] Generation failed for Model ID: {model_id}, Question ID: {question_id} ({result.error}). Saved Answer ID: {answer.id} without rating.")
+            units.finish(failed=1)
+            return answer.id
+        logger.info(f"[Sub-Task] Generated and saved Answer ID: {answer.id} for Model ID: {model_id}.")
 
+        if not rate:
+            logger.info(f"[Sub-Task] Leaving Answer ID: {answer.id} to the batch rating of Question ID: {question_id}.")
+            units.hand_off(1)
+            return answer.id
+
+        rate_answer_task.delay(answer.id, use_cache, run_id)
+        units.hand_off(1)
+        logger.info(f"[Sub-Task] Queued rating of Answer ID: {answer.id} for Model ID: {model_id}, Question ID: {question_id}.")
+        return answer.id
+
+@celery.task(bind=True, max_retries=None)
+def process_model_chunk(self, model_id, question_ids, use_cache=True, run_id=None):
+    """
+    Generates one model's answers to a chunk of questions in a single task: the questions are loaded once,
+    the calls run concurrently and the answers are written in one commit. Successful answers are queued
+    for rating together as one rate_answers_task.
+    """
+    with RunUnits(run_id, len(question_ids)) as units:
+        llm = db.session.get(LLM, model_id)
+        if not llm:
+            logger.error(f"[Chunk Task] Failed: Could not find LLM {model_id}.")
+            units.finish(failed=len(question_ids))
+            return
+
+        if budget_exceeded(run_id):
+            logger.warning(f"[Chunk Task] Run {run_id} is over budget. Skipping {len(question_ids)} questions for Model ID: {model_id}.")
+            units.finish(failed=len(question_ids))
+            return
+
+        questions = Question.query.filter(Question.id.in_(question_ids)).all()
+        if not questions:
+            logger.warning(f"[Chunk Task] None of the questions {question_ids} exist. Nothing to do for Model ID: {model_id}.")
+            units.finish(failed=len(question_ids))
+            return
+
+        provider = provider_group(llm.name, llm.base_url)
+        slots = provider_slots.acquire_up_to(provider, min(ASYNC_MAX_CONCURRENCY, len(questions)))
+        if not slots:
+            logger.info(f"[Chunk Task] Provider {provider} is at its in-flight cap. Requeueing {len(questions)} questions for Model ID: {model_id}.")
+            raise self.retry(countdown=PROVIDER_SLOT_RETRY_DELAY)
+
+        prompts = {
+            question.id: (QUESTION_TEMPLATE[question.question_type].format(question.content), question.question_type)
+            for question in questions
+        }
+        try:
+            results = clients.complete_prompts(llm.id, prompts, len(slots), use_cache)
+        finally:
+            for slot in slots:
+                provider_slots.release(provider, slot)
+
+        answers = []
+        for question_id, result in results.items():
+            answer = build_answer(question_id, llm.id, result)
+            db.session.add(answer)
+            record_call(result, llm.id, 'generation', run_id, answer=answer)
+            answers.append(answer)
+        db.session.commit()
+
+        rated_ids = [answer.id for answer in answers if answer.status == 'ok']
+        logger.info(f"[Chunk Task] Saved {len(answers)} answers for Model ID: {model_id} ({len(answers) - len(rated_ids)} failed).")
+        units.finish(failed=len(question_ids) - len(rated_ids))
+        if rated_ids:
+            rate_answers_task.delay(rated_ids, use_cache, run_id)
+            units.hand_off(len(rated_ids))
+        return [answer.id for answer in answers]
+
+def rating_context(question):
+    """The criteria, total score and rater LLMs that currently apply to a question."""
     setting = Setting.query.filter_by(question_type=question.question_type).first()
     criteria = setting.criteria if setting else DEFAULT_CRITERIA[question.question_type]
     total_score = setting.total_score if setting else DEFAULT_TOTAL_SCORE
-    
     rater_llms = LLM.query.filter(LLM.name.in_(RATERS[question.question_type])).all()
-    rater_ids = [rater.id for rater in rater_llms]
-    
-    logger.info(f"[Sub-Task] Rating Answer ID: {answer.id} with raters: {[r.name for r in rater_llms]}.")
-    
-    rate_answer(answer, question, criteria, total_score, rater_ids)
-    
+    return criteria, total_score, rater_llms
+
+@celery.task
+def rate_answer_task(answer_id, use_cache=True, run_id=None):
+    """Rates one saved answer on the rating queue, so slow rater calls never hold a generation worker."""
+    with RunUnits(run_id, 1) as units:
+        answer = db.session.get(Answer, answer_id)
+        if not answer:
+            logger.error(f"[Rating Task] Failed: Could not find Answer with ID {answer_id}.")
+            units.finish(failed=1)
+            return
+
+        criteria, total_score, rater_llms = rating_context(answer.question)
+        logger.info(f"[Rating Task] Rating Answer ID: {answer.id} with raters: {[r.name for r in rater_llms]}.")
+        rate_answer(answer, answer.question, criteria, total_score, [rater.id for rater in rater_llms], use_cache, run_id)
+        db.session.commit()
+        units.finish(completed=1)
+
+
+@celery.task
+def rate_answers_task(answer_ids, use_cache=True, run_id=None):
+    """
+    Rates a chunk of saved answers, looking up criteria and raters once per question type.
+    Each answer's ratings are committed before the next answer's rater calls, so the SQLite
+    write lock is never held across rater calls. An answer whose rating raises is counted as failed
+    and the rest of the chunk is still rated.
+    """
+    with RunUnits(run_id, len(answer_ids)) as units:
+        answers = Answer.query.filter(Answer.id.in_(answer_ids)).all()
+        contexts = {}
+        rated, failed = 0, len(answer_ids) - len(answers)
+        for answer_id in [answer.id for answer in answers]:
+            try:
+                answer = db.session.get(Answer, answer_id)
+                question_type = answer.question.question_type
+                if question_type not in contexts:
+                    contexts[question_type] = rating_context(answer.question)
+                criteria, total_score, rater_llms = contexts[question_type]
+                rate_answer(answer, answer.question, criteria, total_score, [rater.id for rater in rater_llms], use_cache, run_id)
+                db.session.commit()
+                rated += 1
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"[Rating Task] Failed to rate Answer ID: {answer_id}. Error: {e}", exc_info=True)
+                failed += 1
+        logger.info(f"[Rating Task] Rated {rated} answers in one chunk ({failed} failed).")
+        units.finish(completed=rated, failed=failed)
+
+@celery.task
+def rate_question_task(question_id, use_cache=True, run_id=None):
+    """Rates all unrated answers to a question in batches, after their generation sub-tasks have finished."""
+    question = db.session.get(Question, question_id)
+    if not question:
+        logger.error(f"[Rating Task] Failed: Could not find Question with ID {question_id}.")
+        # 回答随问题一并删除，无法得知交出的单元数；与process_question一致，按全部被测模型计为失败
+        finish_units(run_id, failed=len(evaluated_llms()))
+        return
+
+    answers = Answer.query.filter_by(question_id=question_id, status='ok').filter(~Answer.ratings.any()).all()
+    with RunUnits(run_id, len(answers)) as units:
+        criteria, total_score, rater_llms = rating_context(question)
+        rater_ids = [rater.id for rater in rater_llms]
+
+        logger.info(f"[Rating Task] Batch rating {len(answers)} answers for Question ID: {question_id} with raters: {[r.name for r in rater_llms]}.")
+        rate_answers_batch(answers, question, criteria, total_score, rater_ids, use_cache, run_id)
+        db.session.commit()
+        units.finish(completed=len(answers))
+
+@celery.task
+def retry_failed_answers_task(question_ids=None, use_cache=True, run_id=None):
+    """
+    Regenerates only the (model, question) pairs whose answer failed, leaving all other answers and ratings alone.
+    Without question_ids, failed answers to every question are retried.
+    """
+    query = Answer.query.filter(failed_answer_filter())
+    if question_ids:
+        query = query.filter(Answer.question_id.in_(question_ids))
+    failed = query.with_entities(Answer.id, Answer.llm_id, Answer.question_id).all()
+    if not failed:
+        logger.info("[Retry Task] No failed answers to retry.")
+        return 0
+
+    failed_ids = [answer_id for answer_id, _, _ in failed]
+    pairs = sorted({(llm_id, question_id) for _, llm_id, question_id in failed})
+    discount_answers(failed_ids)
+    LLMCall.query.filter(LLMCall.answer_id.in_(failed_ids))\
+        .update({LLMCall.answer_id: None, LLMCall.rating_id: None}, synchronize_session=False)
+    Rating.query.filter(Rating.answer_id.in_(failed_ids)).delete(synchronize_session=False)
+    Answer.query.filter(Answer.id.in_(failed_ids)).delete(synchronize_session=False)
     db.session.commit()
-    logger.info(f"[Sub-Task] Finished processing for Model ID: {model_id}, Question ID: {question_id}.")
+    logger.info(f"[Retry Task] Deleted {len(failed_ids)} failed answers, regenerating {len(pairs)} model/question pairs.")
+
+    group(
+        process_single_model.s(llm_id, question_id, use_cache, run_id) for llm_id, question_id in pairs
+    ).apply_async()
+    return len(pairs)
 
+@celery.task
+def key_pool_stats_task():
+    """Returns the API key pool statistics of the worker process that runs it."""
+    return clients.key_pool_stats()
 
 @celery.task
-def update_all_questions_for_model(model_id):
+def update_all_questions_for_model(model_id, use_cache=False):
     """
     A Celery task to trigger updates for all questions for a specific model.
+    Regenerates the answers by default instead of reusing cached responses.
     """
     logger.info(f"--- [Model Update Task] Triggered for Model ID: {model_id} ---")
     
-    question_ids = db.session.query(Question.id).all()
+    question_ids = [q_id for q_id, in db.session.query(Question.id).order_by(Question.id).all()]
     if not question_ids:
         logger.warning(f"[Model Update Task] No questions found in the database. Nothing to do for Model ID: {model_id}.")
         return
         
+    chunks = chunked(question_ids)
     job = group(
-        process_single_model.s(model_id, q_id[0]) for q_id in question_ids
+        process_model_chunk.s(model_id, chunk, use_cache) for chunk in chunks
     )
     job.apply_async()
     
-    logger.info(f"[Model Update Task] Queued {len(question_ids)} update sub-tasks for Model ID: {model_id}.")
+    logger.info(f"[Model Update Task] Queued {len(question_ids)} questions in {len(chunks)} chunk tasks for Model ID: {model_id}.")
 
 @celery.task
 def update_all_models_task():
@@ -153,25 +482,39 @@ def update_all_models_task():
             logger.warning("[Scheduled Task] No questions found, skipping.")
             return
 
-        callback = save_evaluation_history_task.si()
-        job = chord(
-            (process_question.si(qid) for qid in all_question_ids),
-            callback
-        )
-        job.apply_async()
+        llms = evaluated_llms()
+        if not llms:
+            logger.warning("[Scheduled Task] No models to evaluate after excluding raters, skipping.")
+            return
 
-        logger.info(f"[Scheduled Task] Successfully queued updates for {len(all_question_ids)} questions with history save callback.")
+        run_id = uuid.uuid4().hex
+        retry_budget.reset(run_id)
+        # 子任务在每个（模型，问题）单元结束时计数，最后一个单元结束时保存历史快照
+        start_run(run_id, len(llms) * len(all_question_ids))
+
+        if ASYNC_FANOUT or RATING_BATCH_ENABLED:
+            # 这两种模式按题目合并请求与评分，仍按题目派发任务
+            tasks = [process_question.si(qid, True, run_id) for qid in all_question_ids]
+        else:
+            clear_answers(all_question_ids)
+            tasks = [
+                process_model_chunk.si(llm.id, chunk, True, run_id)
+                for llm in llms for chunk in chunked(all_question_ids)
+            ]
+        group(tasks).apply_async()
+
+        logger.info(f"[Scheduled Task] Successfully queued {len(tasks)} update tasks for {len(all_question_ids)} questions (run {run_id}); history is saved when all units finish.")
     except Exception as e:
         logger.error(f"[Scheduled Task] Failed to queue update tasks: {e}", exc_info=True)
 
 @celery.task
-def save_evaluation_history_task():
-    """保存当前评估数据为历史记录（由定时任务完成后自动调用）"""
+def save_evaluation_history_task(run_id=None):
+    """保存当前评估数据为历史记录（由评估运行的最后一个单元结束时自动调用）"""
     logger.info("--- [History Save Task] Saving evaluation history snapshot ---")
     try:
         from app.models import EvaluationHistory
 
-        current_data = generate_leaderboard_data()
+        current_data = cached_leaderboard_data()
 
         total_questions = Question.query.count()
 
@@ -188,11 +531,15 @@ def save_evaluation_history_task():
                 'total_dimensions': len(current_data['l1_dimensions']),
                 'total_questions': total_questions,
                 'manual_save': False,
-                'source': 'scheduled_task'
+                'source': 'scheduled_task',
+                'run_id': run_id
             }
         )
         db.session.add(history_record)
         db.session.commit()
+        if run_id:
+            EvaluationRun.query.filter_by(id=run_id).update({EvaluationRun.history_id: history_record.id})
+            db.session.commit()
 
         generate_and_save_reports.delay(history_record.id)
 
@@ -0,0 +1,141 @@
+import logging
+import time
+from app.extensions import db
+from app.models import LLMCall, LLM, Rating
+from app.core.llm import LLMResult
+from app.core.constants import MODEL_PRICES, RUN_BUDGET, RUN_BUDGET_CHECK_INTERVAL, RATERS
+
+logger = logging.getLogger('usage')
+
+_run_cost_cache: dict[str, tuple[float, float]] = {}
+
+
+def call_cost(model_name: str, prompt_tokens: int, completion_tokens: int) -> float:
+    prices = MODEL_PRICES.get(model_name, MODEL_PRICES['default'])
+    return (prompt_tokens * prices['prompt'] + completion_tokens * prices['completion']) / 1_000_000
+
+
+def record_call(result: LLMResult, llm_id: int, purpose: str, run_id: str = None, answer=None, rating=None) -> LLMCall:
+    """Adds a usage record for one logical LLM call to the session; the caller commits."""
+    call = LLMCall(
+        llm_id=llm_id,
+        answer=answer,
+        rating=rating,
+        run_id=run_id,
+        purpose=purpose,
+        prompt_tokens=result.prompt_tokens,
+        completion_tokens=result.completion_tokens,
+        latency=result.latency,
+        retries=result.retries,
+        key_index=result.key_index,
+        outcome=result.outcome
+    )
+    db.session.add(call)
+    return call
+
+
+def _summarize(rows) -> list[dict]:
+    summary = []
+    for row in rows:
+        cost = call_cost(row.name, row.prompt_tokens or 0, row.completion_tokens or 0)
+        summary.append({
+            'name': row.name,
+            'calls': row.calls,
+            'failed_calls': row.failed_calls,
+            'cached_calls': row.cached_calls,
+            'prompt_tokens': row.prompt_tokens or 0,
+            'completion_tokens': row.completion_tokens or 0,
+            'avg_latency': row.avg_latency or 0.0,
+            'retries': row.retries or 0,
+            'cost': cost
+        })
+    return summary
+
+
+def _usage_columns():
+    return (
+        db.func.count(LLMCall.id).label('calls'),
+        db.func.sum(db.case((LLMCall.outcome.notin_(['ok', 'cached']), 1), else_=0)).label('failed_calls'),
+        db.func.sum(db.case((LLMCall.outcome == 'cached', 1), else_=0)).label('cached_calls'),
+        db.func.sum(LLMCall.prompt_tokens).label('prompt_tokens'),
+        db.func.sum(LLMCall.completion_tokens).label('completion_tokens'),
+        db.func.avg(db.case((LLMCall.outcome != 'cached', LLMCall.latency))).label('avg_latency'),
+        db.func.sum(LLMCall.retries).label('retries')
+    )
+
+
+def usage_by_llm(purpose: str, run_id: str = None) -> list[dict]:
+    """Usage and cost per model ('generation') or per rater ('rating'), optionally limited to one run."""
+    query = db.session.query(LLM.name.label('name'), *_usage_columns())\
+        .join(LLM, LLMCall.llm_id == LLM.id)\
+        .filter(LLMCall.purpose == purpose)
+    if run_id:
+        query = query.filter(LLMCall.run_id == run_id)
+    summary = _summarize(query.group_by(LLM.name).all())
+    return sorted(summary, key=lambda x: x['cost'], reverse=True)
+
+
+def usage_by_run(limit: int = 20) -> list[dict]:
+    """Usage and cost of the most recent evaluation runs."""
+    rows = db.session.query(
+        LLMCall.run_id,
+        LLM.name.label('name'),
+        db.func.min(LLMCall.timestamp).label('started'),
+        *_usage_columns()
+    ).join(LLM, LLMCall.llm_id == LLM.id)\
+     .filter(LLMCall.run_id.isnot(None))\
+     .group_by(LLMCall.run_id, LLM.name).all()
+
+    runs = {}
+    for row, model_summary in zip(rows, _summarize(rows)):
+        run = runs.setdefault(row.run_id, {
+            'run_id': row.run_id, 'started': row.started,
+            'calls': 0, 'failed_calls': 0, 'cached_calls': 0,
+            'prompt_tokens': 0, 'completion_tokens': 0, 'retries': 0, 'cost': 0.0
+        })
+        run['started'] = min(run['started'], row.started)
+        for key in ('calls', 'failed_calls', 'cached_calls', 'prompt_tokens', 'completion_tokens', 'retries', 'cost'):
+            run[key] += model_summary[key]
+
+    recent = sorted(runs.values(), key=lambda x: x['started'], reverse=True)[:limit]
+    rule_ratings = rule_ratings_by_run([run['run_id'] for run in recent])
+    for run in recent:
+        run['rule_ratings'] = rule_ratings.get(run['run_id'], 0)
+        run['skipped_calls'] = run['rule_ratings'] * len(RATERS['objective'])
+    return recent
+
+
+def rule_ratings_by_run(run_ids: list[str]) -> dict[str, int]:
+    """Number of objective answers scored by rule (without a rater call) per run, found through their generation calls."""
+    if not run_ids:
+        return {}
+    rows = db.session.query(LLMCall.run_id, db.func.count(db.distinct(Rating.id)))\
+        .join(Rating, Rating.answer_id == LLMCall.answer_id)\
+        .filter(LLMCall.purpose == 'generation', LLMCall.run_id.in_(run_ids), Rating.method == 'rule')\
+        .group_by(LLMCall.run_id).all()
+    return dict(rows)
+
+
+def run_cost(run_id: str) -> float:
+    rows = db.session.query(
+        LLM.name,
+        db.func.sum(LLMCall.prompt_tokens),
+        db.func.sum(LLMCall.completion_tokens)
+    ).join(LLM, LLMCall.llm_id == LLM.id)\
+     .filter(LLMCall.run_id == run_id)\
+     .group_by(LLM.name).all()
+    return sum(call_cost(name, prompt_tokens or 0, completion_tokens or 0) for name, prompt_tokens, completion_tokens in rows)
+
+
+def budget_exceeded(run_id: str | None) -> bool:
+    """True once a run has spent its RUN_BUDGET; the spent amount is re-queried at most every few seconds."""
+    if run_id is None or RUN_BUDGET is None:
+        return False
+    checked_at, cost = _run_cost_cache.get(run_id, (0.0, 0.0))
+    if time.time() - checked_at >= RUN_BUDGET_CHECK_INTERVAL:
+        cost = run_cost(run_id)
+        _run_cost_cache[run_id] = (time.time(), cost)
+    if cost >= RUN_BUDGET:
+        logger.warning(f"Run {run_id} has spent {cost:.4f} of its {RUN_BUDGET} budget. Not dispatching new calls.")
+        return True
+    return False
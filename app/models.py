@@ -44,6 +44,10 @@ class Answer(db.Model):
     llm_id = db.Column(db.Integer, db.ForeignKey('llm.id'), nullable=False)
     content = db.Column(db.Text, nullable=False)
     timestamp = db.Column(db.DateTime, default=db.func.current_timestamp())
+    # 生成状态：'ok'为正常回答，'failed'为生成失败（content保存错误信息，不参与评分）
+    status = db.Column(db.String(16), nullable=False, default='ok', server_default='ok')
+    # 失败类型：connection_error、api_error、client_error、empty_response
+    error = db.Column(db.String(32))
     
     question = db.relationship('Question', back_populates='answers')
     ratings = db.relationship('Rating', back_populates='answer', cascade="all, delete-orphan")
@@ -59,6 +63,8 @@ class Rating(db.Model):
     score = db.Column(db.Float, nullable=False)
     comment = db.Column(db.Text)
     is_responsive = db.Column(db.Boolean, nullable=False)
+    # 评分方式：'llm'为评分模型打分，'rule'为客观题规则评分
+    method = db.Column(db.String(16), nullable=False, default='llm', server_default='llm')
     timestamp = db.Column(db.DateTime, default=db.func.current_timestamp())
     
     answer = db.relationship('Answer', back_populates='ratings')
@@ -67,6 +73,70 @@ class Rating(db.Model):
     def __repr__(self):
         return f'<Rating {self.score} by {self.llm.name} for Answer {self.answer_id}>'
 
+class RatingCacheEntry(db.Model):
+    """评分缓存：同一题目下规范化后相同的回答直接复用评分模型给出的分数。
+    criteria_hash涵盖题目内容、评分规则、总分与评分模型配置，任一变化后旧分数不再命中。"""
+    id = db.Column(db.Integer, primary_key=True)
+    question_id = db.Column(db.Integer, db.ForeignKey('question.id'), nullable=False, index=True)
+    answer_hash = db.Column(db.String(64), nullable=False)
+    rater_id = db.Column(db.Integer, db.ForeignKey('llm.id'), nullable=False)
+    criteria_hash = db.Column(db.String(64), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    timestamp = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
+
+    __table_args__ = (db.UniqueConstraint('question_id', 'answer_hash', 'rater_id', name='uq_rating_cache_entry'),)
+
+    def __repr__(self):
+        return f'<RatingCacheEntry {self.score} by LLM {self.rater_id} for Q{self.question_id}>'
+
+class ScoreAggregate(db.Model):
+    """排行榜分数汇总：按（被测模型，维度，题型）累计评分总分、评分数与有效回应数，题目所在维度及其各级上级维度各一行。
+    随Rating的插入与删除在同一事务中增减；出现偏差时可用 flask rebuild-score-aggregates 从全部评分重建。"""
+    id = db.Column(db.Integer, primary_key=True)
+    llm_id = db.Column(db.Integer, db.ForeignKey('llm.id'), nullable=False, index=True)
+    dimension_id = db.Column(db.Integer, db.ForeignKey('dimension.id'), nullable=False, index=True)
+    question_type = db.Column(db.String(20), nullable=False)
+    score_total = db.Column(db.Float, nullable=False, default=0.0)
+    rating_count = db.Column(db.Integer, nullable=False, default=0)
+    responsive_count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (db.UniqueConstraint('llm_id', 'dimension_id', 'question_type', name='uq_score_aggregate'),)
+
+    def __repr__(self):
+        return f'<ScoreAggregate LLM {self.llm_id} Dim {self.dimension_id} {self.question_type}: {self.rating_count}>'
+
+class DataVersion(db.Model):
+    """数据版本号：评分、问题、维度、模型或设置变化时在同一事务中加一，排行榜缓存以此判断是否过期"""
+    name = db.Column(db.String(32), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DataVersion {self.name}: {self.version}>'
+
+class LLMCall(db.Model):
+    """单次LLM调用的用量记录（token、耗时、重试次数、使用的密钥与结果）"""
+    id = db.Column(db.Integer, primary_key=True)
+    llm_id = db.Column(db.Integer, db.ForeignKey('llm.id'), nullable=False, index=True)
+    answer_id = db.Column(db.Integer, db.ForeignKey('answer.id'), nullable=True, index=True)
+    rating_id = db.Column(db.Integer, db.ForeignKey('rating.id'), nullable=True, index=True)
+    run_id = db.Column(db.String(32), nullable=True, index=True)
+    purpose = db.Column(db.String(20), nullable=False)
+    prompt_tokens = db.Column(db.Integer, nullable=False, default=0)
+    completion_tokens = db.Column(db.Integer, nullable=False, default=0)
+    latency = db.Column(db.Float, nullable=False, default=0.0)
+    retries = db.Column(db.Integer, nullable=False, default=0)
+    key_index = db.Column(db.Integer, nullable=True)
+    outcome = db.Column(db.String(30), nullable=False)
+    timestamp = db.Column(db.DateTime, default=db.func.current_timestamp())
+    
+    answer = db.relationship('Answer', backref='llm_calls')
+    rating = db.relationship('Rating', backref='llm_calls')
+    # 删除模型时一并删除其用量记录（llm_id不可为空）
+    llm = db.relationship('LLM', backref=db.backref('llm_calls', cascade='all, delete-orphan'))
+    
+    def __repr__(self):
+        return f'<LLMCall {self.purpose} by LLM {self.llm_id}: {self.outcome}>'
+
 class Setting(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     question_type = db.Column(db.String(20), nullable=False)
@@ -92,6 +162,22 @@ class LLM(db.Model):
     def __repr__(self):
         return f'<LLM {self.name} ({self.model})>'
 
+class EvaluationRun(db.Model):
+    """一次全量评估运行的进度：每个（模型，问题）为一个单元，生成并评分完成或失败后计数。
+    所有单元结束时由计数到达expected的那次更新触发历史快照与报告，且只触发一次。"""
+    id = db.Column(db.String(32), primary_key=True)
+    expected = db.Column(db.Integer, nullable=False, default=0)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+    failed = db.Column(db.Integer, nullable=False, default=0)
+    # 'running'或'finished'
+    status = db.Column(db.String(16), nullable=False, default='running')
+    started_at = db.Column(db.DateTime, default=db.func.current_timestamp(), nullable=False)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    history_id = db.Column(db.Integer, db.ForeignKey('evaluation_history.id'), nullable=True)
+
+    def __repr__(self):
+        return f'<EvaluationRun {self.id}: {self.completed + self.failed}/{self.expected}>'
+
 class EvaluationHistory(db.Model):
     """评估历史记录表，存储每次更新全部模型后的快照数据"""
     id = db.Column(db.Integer, primary_key=True)
@@ -11,6 +11,7 @@ from app.routes.public.history import history_bp
 from app.routes.public.model_detail import model_detail_bp
 from app.routes.dev.exports import exports_bp
 from app.routes.public.exports import public_exports_bp
+from app.routes.dev.usage import usage_bp
 
 __all__ = [
     'dimensions_bp',
@@ -25,7 +26,8 @@ __all__ = [
     'history_bp',
     'model_detail_bp',
     'exports_bp',
-    'public_exports_bp'
+    'public_exports_bp',
+    'usage_bp'
 ]
 
 blueprints = [
@@ -41,5 +43,6 @@ blueprints = [
     history_bp,
     model_detail_bp,
     exports_bp,
-    public_exports_bp
+    public_exports_bp,
+    usage_bp
 ]
\ No newline at end of file
@@ -3,7 +3,7 @@ import logging
 from app.models import EvaluationHistory, Question
 from app.extensions import db
 
-from app.core.utils import generate_leaderboard_data
+from app.core.utils import cached_leaderboard_data
 from app.routes.dev.auth import admin_required
 from flask_login import login_required
 
@@ -56,7 +56,7 @@ def save_current_data_to_history():
     logger.info("Received request to save current evaluation data to history.")
     
     try:
-        current_data = generate_leaderboard_data()
+        current_data = cached_leaderboard_data()
         
         total_questions = Question.query.count()
         
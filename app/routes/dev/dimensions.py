@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for
 from app.models import Dimension, Question
 from app.extensions import db
+from app.core.score_aggregates import rebuild_score_aggregates
 from app.routes.dev.auth import admin_required
 from flask_login import login_required
 import logging
@@ -54,6 +55,9 @@ def manage_dimensions():
             if dim:
                 logger.warning(f"Attempting to delete dimension '{dim.name}' (ID: {dim.id}).")
                 db.session.delete(dim)
+                db.session.flush()
+                # 题目仍挂在被删除的维度下，其评分不再计入上级维度，需重建汇总
+                rebuild_score_aggregates()
                 flash(f'维度 "{dim.name}" 已删除', 'success')
                 logger.info(f"Successfully deleted dimension '{dim.name}' (ID: {dim.id}).")
         
@@ -1,5 +1,5 @@
 import os
-from flask import Blueprint, render_template, flash, redirect, url_for, request, current_app
+from flask import Blueprint, render_template, flash, redirect, url_for, request, current_app, jsonify
 from app.models import LLM
 from app.extensions import db
 from app.forms import LLMForm
@@ -20,6 +20,21 @@ def model_management():
     llms = LLM.query.all()
     return render_template('dev/model_management.html', llms=llms)
 
+@models_bp.route('/key-stats')
+@login_required
+@admin_required
+def key_stats():
+    """API密钥池状态：source=worker时返回一个Celery工作进程中的统计，否则返回Web进程中的统计"""
+    if request.args.get('source') == 'worker':
+        from app.core.tasks import key_pool_stats_task
+        logger.info("Fetching key pool stats from a Celery worker.")
+        try:
+            return jsonify(key_pool_stats_task.delay().get(timeout=10))
+        except Exception as e:
+            logger.error(f"Failed to fetch key pool stats from worker: {e}", exc_info=True)
+            return jsonify({'error': '无法从Celery工作进程获取密钥池状态。'}), 503
+    return jsonify(clients.key_pool_stats())
+
 @models_bp.route('/add', methods=['GET', 'POST'])
 @login_required
 @admin_required
@@ -5,7 +5,8 @@ from app.extensions import db
 from app.routes.dev.auth import admin_required
 from flask_login import login_required
 import logging
-from app.core.tasks import process_question
+from app.core.tasks import process_question, retry_failed_answers_task
+from app.core.score_aggregates import discount_answers
 
 questions_bp = Blueprint('questions', __name__, url_prefix='/dev/question')
 logger = logging.getLogger('question_routes')
@@ -92,7 +93,8 @@ def update_questions():
         if question_id:
             
             logger.info(f"Queuing single question update task for question ID: {question_id}.")
-            process_question.delay(int(question_id))
+            # 手动更新需要重新生成回答，不使用响应缓存
+            process_question.delay(int(question_id), use_cache=False)
             
             return jsonify({
                 'status': 'queued', 
@@ -104,6 +106,15 @@ def update_questions():
     questions = Question.query.order_by(Question.id.desc()).all()
     return render_template('dev/update_questions.html', questions=questions)
 
+@questions_bp.route('/retry_failed', methods=['POST'])
+@login_required
+@admin_required
+def retry_failed_answers():
+    logger.info("Queuing retry of failed answers for all questions.")
+    retry_failed_answers_task.delay()
+    flash('已将所有失败回答的重试任务加入后台队列，其余回答保持不变。', 'info')
+    return redirect(url_for('questions.update_questions'))
+
 @questions_bp.route('/status/<int:question_id>', methods=['GET'])
 def get_question_status(question_id):
     question = Question.query.get_or_404(question_id)
@@ -127,11 +138,16 @@ def bulk_action():
     if action == 'update':
         
         for qid in question_ids:
-            process_question.delay(int(qid))
+            process_question.delay(int(qid), use_cache=False)
         flash(f'已将 {len(question_ids)} 个问题的更新任务加入后台队列。', 'info')
         
+    elif action == 'retry_failed':
+        retry_failed_answers_task.delay([int(qid) for qid in question_ids])
+        flash(f'已将 {len(question_ids)} 个问题中失败回答的重试任务加入后台队列。', 'info')
+        
     elif action == 'delete':
         logger.warning(f"Bulk deleting questions with IDs: {question_ids}.")
+        discount_answers(db.session.query(Answer.id).filter(Answer.question_id.in_(question_ids)).scalar_subquery())
         Question.query.filter(Question.id.in_(question_ids)).delete(synchronize_session=False)
         db.session.commit()
         flash(f'已成功删除 {len(question_ids)} 个选定的问题。', 'success')
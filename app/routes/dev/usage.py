@@ -0,0 +1,43 @@
+from flask import Blueprint, render_template, request, jsonify
+import logging
+from app.core.usage import usage_by_llm, usage_by_run
+from app.core.queues import queue_stats
+from app.core.runs import recent_runs, run_progress
+from app.models import EvaluationRun
+from app.core.constants import RUN_BUDGET
+from app.routes.dev.auth import admin_required
+from flask_login import login_required
+
+usage_bp = Blueprint('usage', __name__, url_prefix='/dev/usage')
+logger = logging.getLogger('usage_routes')
+
+@usage_bp.route('/')
+@login_required
+@admin_required
+def usage():
+    """LLM调用用量与费用统计：按模型、按评分模型、按评估运行汇总"""
+    run_id = request.args.get('run_id') or None
+    logger.info(f"Accessed usage page. Run filter: {run_id}")
+    return render_template('dev/usage.html',
+                           model_usage=usage_by_llm('generation', run_id),
+                           rater_usage=usage_by_llm('rating', run_id),
+                           run_usage=usage_by_run(),
+                           run_id=run_id,
+                           run_budget=RUN_BUDGET,
+                           queue_stats=queue_stats(),
+                           evaluation_runs=recent_runs())
+
+@usage_bp.route('/queues')
+@login_required
+@admin_required
+def queues():
+    """生成与评分队列的积压任务数和吞吐量"""
+    return jsonify(queue_stats())
+
+@usage_bp.route('/runs/<run_id>')
+@login_required
+@admin_required
+def run_status(run_id):
+    """评估运行的进度、吞吐量与预计剩余时间"""
+    run = EvaluationRun.query.get_or_404(run_id)
+    return jsonify(run_progress(run))
@@ -0,0 +1,243 @@
+"""
+离线的OpenAI兼容聊天补全模拟服务，用于在不消耗API额度的情况下压测与演练整个评估流程。
+
+将LLM.base_url指向 http://127.0.0.1:<port>/v1 即可。回答是确定性的：客观题返回选项字母，
+评分请求返回分数，其余返回固定文本；可配置延迟分布以及429/500/断开连接等故障注入。
+
+    python llm_simulator.py --port 8001 --latency lognormal --latency-mean 800 --rate-429 0.05
+"""
+import argparse
+import hashlib
+import json
+import logging
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+logger = logging.getLogger('llm_simulator')
+
+# 与app.core.constants中QUESTION_TEMPLATE['objective']、RATING_TEMPLATE和RATING_BATCH_TEMPLATE的开头保持一致
+OBJECTIVE_PROMPT_PREFIX = '请阅读下面的题目'
+RATING_PROMPT_PREFIX = '请你评价'
+BATCH_RATING_PROMPT_PREFIX = '请你分别评价'
+BATCH_ITEM_PATTERN = re.compile(r'^ai回答(\d+)：', re.MULTILINE)
+
+SUBJECTIVE_REPLY = '这个问题涉及复杂的社会议题，我无法认同其中的观点。正确的看法应当基于事实与公平原则，避免对任何群体的偏见。'
+
+
+class SimulatorConfig:
+    def __init__(self, args: argparse.Namespace):
+        self.latency = args.latency
+        self.latency_mean = args.latency_mean / 1000
+        self.latency_sigma = args.latency_sigma
+        self.chunk_delay = args.chunk_delay / 1000
+        self.rate_429 = args.rate_429
+        self.rate_500 = args.rate_500
+        self.rate_drop = args.rate_drop
+        self.retry_after = args.retry_after
+        self.invalid_key_prefix = args.invalid_key_prefix
+        self.random = random.Random(args.seed)
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'ok': 0, '401': 0, '429': 0, '500': 0, 'dropped': 0}
+
+    def sample_latency(self) -> float:
+        with self.lock:
+            if self.latency == 'fixed':
+                return self.latency_mean
+            if self.latency == 'uniform':
+                return self.random.uniform(0, 2 * self.latency_mean)
+            if self.latency == 'exponential':
+                return self.random.expovariate(1 / self.latency_mean) if self.latency_mean > 0 else 0.0
+            mu = math.log(self.latency_mean) - self.latency_sigma ** 2 / 2 if self.latency_mean > 0 else 0.0
+            return self.random.lognormvariate(mu, self.latency_sigma) if self.latency_mean > 0 else 0.0
+
+    def sample_fault(self) -> str | None:
+        with self.lock:
+            roll = self.random.random()
+        for fault, rate in (('429', self.rate_429), ('500', self.rate_500), ('dropped', self.rate_drop)):
+            if roll < rate:
+                return fault
+            roll -= rate
+        return None
+
+    def count(self, outcome: str):
+        with self.lock:
+            self.stats['requests'] += 1
+            self.stats[outcome] += 1
+
+
+def deterministic_reply(prompt: str) -> str:
+    """Same prompt, same reply: a choice letter for objective questions, a score (or a JSON array of them) for rater prompts, text otherwise."""
+    digest = int(hashlib.sha256(prompt.encode('utf-8')).hexdigest(), 16)
+    if prompt.startswith(BATCH_RATING_PROMPT_PREFIX):
+        ids = [int(i) for i in BATCH_ITEM_PATTERN.findall(prompt)]
+        return json.dumps([{'id': i, 'score': (digest >> i) % 6} for i in ids])
+    if prompt.startswith(OBJECTIVE_PROMPT_PREFIX):
+        return 'ABCD'[digest % 4]
+    if prompt.startswith(RATING_PROMPT_PREFIX):
+        return str(digest % 6)
+    return SUBJECTIVE_REPLY
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 2 + 1
+
+
+class SimulatorHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    config: SimulatorConfig = None
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _send_json(self, status: int, payload: dict, headers: dict = None):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: int, message: str, error_type: str, headers: dict = None):
+        self._send_json(status, {'error': {'message': message, 'type': error_type}}, headers)
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/models'):
+            self._send_json(200, {'object': 'list', 'data': [{'id': 'simulator', 'object': 'model', 'owned_by': 'simulator'}]})
+        elif self.path.rstrip('/').endswith('/stats'):
+            with self.config.lock:
+                self._send_json(200, dict(self.config.stats))
+        else:
+            self._send_error(404, 'Not found', 'invalid_request_error')
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_error(404, 'Not found', 'invalid_request_error')
+            return
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b'{}')
+        except json.JSONDecodeError:
+            self._send_error(400, 'Invalid JSON body', 'invalid_request_error')
+            return
+
+        api_key = self.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if self.config.invalid_key_prefix and api_key.startswith(self.config.invalid_key_prefix):
+            self.config.count('401')
+            self._send_error(401, 'Incorrect API key provided.', 'invalid_request_error')
+            return
+
+        time.sleep(self.config.sample_latency())
+        fault = self.config.sample_fault()
+        if fault is not None:
+            self.config.count(fault)
+        if fault == '429':
+            self._send_error(429, 'Rate limit reached (simulated).', 'rate_limit_error', {'Retry-After': str(self.config.retry_after)})
+            return
+        if fault == '500':
+            self._send_error(500, 'Internal server error (simulated).', 'server_error')
+            return
+        if fault == 'dropped':
+            self.close_connection = True
+            self.connection.close()
+            return
+
+        messages = request.get('messages') or [{}]
+        prompt = str(messages[-1].get('content', ''))
+        reply = deterministic_reply(prompt)
+        model = request.get('model', 'simulator')
+        usage = {
+            'prompt_tokens': estimate_tokens(prompt),
+            'completion_tokens': estimate_tokens(reply),
+            'total_tokens': estimate_tokens(prompt) + estimate_tokens(reply)
+        }
+        self.config.count('ok')
+
+        if request.get('stream'):
+            include_usage = (request.get('stream_options') or {}).get('include_usage', False)
+            self._stream(model, reply, usage if include_usage else None)
+            return
+
+        self._send_json(200, {
+            'id': f'chatcmpl-{uuid.uuid4().hex}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': reply}, 'finish_reason': 'stop'}],
+            'usage': usage
+        })
+
+    def _stream(self, model: str, reply: str, usage: dict | None):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        completion_id = f'chatcmpl-{uuid.uuid4().hex}'
+        def chunk(choices: list, extra: dict = None) -> dict:
+            return {'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                    'model': model, 'choices': choices, **(extra or {})}
+
+        events = [chunk([{'index': 0, 'delta': {'role': 'assistant', 'content': ''}, 'finish_reason': None}])]
+        pieces = [reply[i:i + 4] for i in range(0, len(reply), 4)] + ['\n']
+        events += [chunk([{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}]) for piece in pieces]
+        events.append(chunk([{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]))
+        if usage is not None:
+            events.append(chunk([], {'usage': usage}))
+
+        try:
+            for event in events:
+                self._write_chunk(f'data: {json.dumps(event, ensure_ascii=False)}\n\n')
+                time.sleep(self.config.chunk_delay)
+            self._write_chunk('data: [DONE]\n\n')
+            self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            logger.debug("Client closed the stream early.")
+
+    def _write_chunk(self, data: str):
+        encoded = data.encode('utf-8')
+        self.wfile.write(f'{len(encoded):x}\r\n'.encode() + encoded + b'\r\n')
+        self.wfile.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline OpenAI-compatible chat completions simulator.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--latency', choices=['fixed', 'uniform', 'exponential', 'lognormal'], default='lognormal')
+    parser.add_argument('--latency-mean', type=float, default=500, help='mean latency in milliseconds')
+    parser.add_argument('--latency-sigma', type=float, default=0.6, help='sigma of the lognormal distribution')
+    parser.add_argument('--chunk-delay', type=float, default=20, help='delay between streamed chunks in milliseconds')
+    parser.add_argument('--rate-429', type=float, default=0.0)
+    parser.add_argument('--rate-500', type=float, default=0.0)
+    parser.add_argument('--rate-drop', type=float, default=0.0, help='share of requests whose connection is dropped')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='Retry-After seconds sent with 429 responses')
+    parser.add_argument('--invalid-key-prefix', default='invalid', help='API keys with this prefix get a 401')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)-8s - %(name)-20s - %(message)s')
+    SimulatorHandler.config = SimulatorConfig(args)
+    server = ThreadingHTTPServer((args.host, args.port), SimulatorHandler)
+    server.daemon_threads = True
+    logger.info(f"LLM simulator listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("LLM simulator stopped.")
+
+
+if __name__ == '__main__':
+    main()
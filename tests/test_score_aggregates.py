@@ -0,0 +1,64 @@
+import pytest
+from flask import Flask
+from app.extensions import db
+from app.models import Dimension, Question, Answer, Rating, LLM, ScoreAggregate
+from app.core.score_aggregates import rebuild_score_aggregates
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{tmp_path / "test.db"}'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+
+
+@pytest.fixture
+def rating(app):
+    parent = Dimension(name='L1', level=1)
+    db.session.add(parent)
+    db.session.flush()
+    child = Dimension(name='L2', level=2, parent=parent.id)
+    llm = LLM(name='m1', model='m1', base_url='http://localhost/v1', api_keys=['k'])
+    db.session.add_all([child, llm])
+    db.session.flush()
+    question = Question(dimension_id=child.id, question_type='subjective', content='Q', answer='A')
+    db.session.add(question)
+    db.session.flush()
+    answer = Answer(question_id=question.id, llm_id=llm.id, content='x')
+    db.session.add(answer)
+    db.session.flush()
+    rating = Rating(answer_id=answer.id, llm_id=llm.id, score=5.0, is_responsive=True)
+    db.session.add(rating)
+    db.session.commit()
+    return rating
+
+
+def aggregates():
+    return sorted(
+        (row.llm_id, row.dimension_id, row.question_type, row.score_total, row.rating_count, row.responsive_count)
+        for row in ScoreAggregate.query.all()
+    )
+
+
+def test_updating_an_expired_rating_moves_its_score(rating):
+    # 提交后rating已过期，修改score时对象上没有旧值
+    rating.score = 2.0
+    rating.is_responsive = False
+    db.session.commit()
+
+    assert {row[3:] for row in aggregates()} == {(2.0, 1, 0)}
+    updated = aggregates()
+    rebuild_score_aggregates()
+    assert aggregates() == updated
+
+
+def test_deleting_after_an_update_leaves_nothing(rating):
+    rating.score = 2.0
+    db.session.commit()
+    db.session.delete(rating)
+    db.session.commit()
+
+    assert {row[3:] for row in aggregates()} == {(0.0, 0, 0)}
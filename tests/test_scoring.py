@@ -0,0 +1,34 @@
+import pytest
+from app.core.scoring import extract_score, judge_objective
+
+
+@pytest.mark.parametrize('reply', [
+    '这个回答存在一定风险',
+    '无法评分，这是一个拒绝回答',
+    '满分5分。',
+    '这个回答十分危险',
+])
+def test_no_score_is_read_from_ordinary_words_or_the_scale(reply):
+    assert extract_score(reply, 5).score is None
+
+
+@pytest.mark.parametrize('reply, total_score, score', [
+    ('5分制下得2分', 5, 2.0),
+    ('满分10分，得3分', 10, 3.0),
+    ('评分：4', 5, 4.0),
+    ('我给三分', 5, 3.0),
+    ('3/5', 5, 3.0),
+    ('这个回答可以给 4', 5, 4.0),
+])
+def test_score_from_text(reply, total_score, score):
+    assert extract_score(reply, total_score).score == score
+
+
+@pytest.mark.parametrize('reply, verdict', [
+    ('A model cannot answer this.', None),
+    ('B. 因为……', 'correct'),
+    ('(B)', 'correct'),
+    ('答案是C', 'wrong'),
+])
+def test_objective_verdict(reply, verdict):
+    assert judge_objective(reply, 'B')[0] == verdict